@@ -0,0 +1,86 @@
+from fastapi import FastAPI, Request
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+async def simulate_latency(latency: float, jitter: float):
+    delay = max(latency + random.uniform(-jitter, jitter), 0.0)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+def fake_embedding(text: str, dimension: int, tokens: int = 4) -> list:
+    """Saída por token ([tokens, dim]) determinística a partir do texto, como a feature-extraction do HF"""
+    rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+    return [[rng.uniform(-1, 1) for _ in range(dimension)] for _ in range(tokens)]
+
+def create_fake_huggingface(latency: float = 0.05, jitter: float = 0.01, dimension: int = 768) -> FastAPI:
+    """Substituto local da inference API do HuggingFace (feature-extraction), com latência configurável"""
+    app = FastAPI()
+
+    @app.post("/{path:path}")
+    async def feature_extraction(path: str, request: Request):
+        body = await request.json()
+        await simulate_latency(latency, jitter)
+
+        inputs = body.get("inputs")
+        if isinstance(inputs, list):
+            return [fake_embedding(text, dimension) for text in inputs]
+        return fake_embedding(inputs, dimension)
+
+    return app
+
+def create_fake_groq(latency: float = 0.5, jitter: float = 0.1, target_file: str = None, target_function: str = None) -> FastAPI:
+    """Substituto local da API de chat completions do Groq, com latência configurável.
+
+    Responde ao prompt de análise com o alvo fixo e ao prompt de mutação com uma edição
+    na primeira linha da função alvo.
+    """
+    app = FastAPI()
+    target_file = target_file or "/opt/stack/nova/nova/compute/manager.py"
+    target_function = target_function or "_spawn"
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await simulate_latency(latency, jitter)
+
+        prompt = body["messages"][-1]["content"]
+        if "CÓDIGO A MUTAR" in prompt:
+            content = json.dumps({
+                "modifications": [
+                    {"line_number": 2, "new_content": "    return None", "reason": "retorno antecipado"}
+                ]
+            })
+        else:
+            content = json.dumps({
+                "target_file": target_file,
+                "target_function": target_function,
+                "reasoning": "alvo fixo do benchmark",
+                "knowledge_used": [0]
+            })
+
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+        completion_tokens = len(content) // 4
+
+        return {
+            "id": f"chatcmpl-{random.getrandbits(64):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    return app
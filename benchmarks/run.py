@@ -0,0 +1,276 @@
+"""Benchmark de carga do CIMut com agentes simulados e substitutos locais do HuggingFace e do Groq.
+
+Uso:
+    python -m benchmarks.run --agents 200 --rate 50 --duration 30
+    python -m benchmarks.run --scenarios verify,fault --max-p99-ms 250 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import uvicorn
+from benchmarks.fake_services import create_fake_groq, create_fake_huggingface
+from benchmarks.simulated_agents import start_agents
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_FILE = "/opt/stack/nova/nova/compute/manager.py"
+QUERIES = ["timeout RPC", "nenhum host válido", "falha na criação de instâncias", "erro de binding de porta"]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def serve(app, port: int) -> tuple:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+def start_api(port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **env}
+    )
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API não ficou pronta a tempo")
+
+def build_request(scenario: str, agent_ids: list, fanout: int):
+    agent_id = random.choice(agent_ids)
+
+    if scenario == "verify":
+        return f"/api/agents/{agent_id}/verify", {"file_path": TARGET_FILE, "line_number": random.randint(1, 100)}
+    if scenario == "fault":
+        return f"/api/agents/{agent_id}/fault", {"file_path": TARGET_FILE, "line_number": random.randint(1, 100), "new_content": "x = 1"}
+    if scenario == "broadcast":
+        return "/api/agents/broadcast", {
+            "command": {"action": "read_file", "file_path": TARGET_FILE, "line_number": 1},
+            "agent_ids": random.sample(agent_ids, min(fanout, len(agent_ids)))
+        }
+    if scenario == "find-fault-target":
+        return f"/api/agents/{agent_id}/find-fault-target", {"query": random.choice(QUERIES)}
+
+    raise ValueError(f"Cenário desconhecido: {scenario}")
+
+def is_success(scenario: str, response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    body = response.json()
+    if scenario == "find-fault-target":
+        return 'error' not in body
+    if scenario == "broadcast":
+        return body['summary']['success'] == body['total']
+    return True
+
+async def drive(client: httpx.AsyncClient, scenario: str, rate: float, duration: float, agent_ids: list, fanout: int) -> dict:
+    """Carga em malha aberta: dispara `rate` requisições/s durante `duration` s, sem esperar as anteriores"""
+    results = []
+
+    async def one_request():
+        path, body = build_request(scenario, agent_ids, fanout)
+        started_at = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            ok = is_success(scenario, response)
+        except httpx.HTTPError:
+            ok = False
+        results.append((time.perf_counter() - started_at, ok))
+
+    tasks = []
+    started_at = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started_at < duration:
+        tasks.append(asyncio.create_task(one_request()))
+        sent += 1
+        await asyncio.sleep(max(started_at + sent / rate - time.perf_counter(), 0))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started_at
+
+    latencies = sorted(latency for latency, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+def parse_histogram(metrics_text: str, name: str) -> dict:
+    """Extrai buckets cumulativos, soma e contagem de um histograma Prometheus (somando os rótulos)"""
+    buckets, total_sum, count = {}, 0.0, 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{name}_bucket"):
+            le = re.search(r'le="([^"]+)"', line).group(1)
+            buckets[float(le)] = buckets.get(float(le), 0.0) + float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_sum"):
+            total_sum += float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_count"):
+            count += float(line.rsplit(" ", 1)[1])
+    return {"buckets": buckets, "sum": total_sum, "count": count}
+
+def histogram_delta(before: dict, after: dict) -> dict:
+    return {
+        "buckets": {le: value - before["buckets"].get(le, 0.0) for le, value in after["buckets"].items()},
+        "sum": after["sum"] - before["sum"],
+        "count": after["count"] - before["count"]
+    }
+
+def histogram_quantile(histogram: dict, quantile: float) -> float:
+    """Limite superior do primeiro bucket que cobre o quantil (mesma aproximação do Prometheus, sem interpolação)"""
+    if histogram["count"] <= 0:
+        return 0.0
+    for le in sorted(histogram["buckets"]):
+        if histogram["buckets"][le] >= quantile * histogram["count"]:
+            return le
+    return float("inf")
+
+async def event_loop_lag(client: httpx.AsyncClient) -> dict:
+    return parse_histogram((await client.get("/metrics")).text, "cimut_event_loop_lag_seconds")
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        hf_port, groq_port = free_port(), free_port()
+        fakes = [
+            await serve(create_fake_huggingface(args.embedding_latency, args.embedding_latency / 5), hf_port),
+            await serve(create_fake_groq(args.llm_latency, args.llm_latency / 5, TARGET_FILE), groq_port)
+        ]
+
+        api = None
+        base_url = args.url
+        if base_url is None:
+            api_port = free_port()
+            base_url = f"http://127.0.0.1:{api_port}"
+            api = start_api(api_port, {
+                "EMBEDDING_URL": f"http://127.0.0.1:{hf_port}/models/microsoft/codebert-base",
+                "HUGGINGFACE_TOKEN": "bench",
+                "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+                "GROQ_API_KEY": "bench",
+                "EMBEDDING_RATE_LIMIT": "0",
+                "EMBEDDINGS_PATH": os.path.join(workdir, "embeddings"),
+                "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+                "LLM_CACHE_SIZE": "1000" if args.warm_caches else "0",
+                "QUERY_CACHE_SIZE": "256" if args.warm_caches else "0",
+                "AGENT_MAX_INFLIGHT": str(args.agent_max_inflight)
+            })
+
+        stop = asyncio.Event()
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+                await wait_ready(client)
+
+                ws_url = base_url.replace("http", "ws", 1) + "/api/agent/connect"
+                agents, agent_tasks = await start_agents(
+                    ws_url, args.agents, stop,
+                    latency=args.agent_latency, jitter=args.agent_latency / 5, file_lines=args.file_lines,
+                    indexed_files=[TARGET_FILE],
+                    codecs=[args.codec, "json"],
+                    compression=["zlib"] if args.compression else None
+                )
+                agent_ids = [agent.agent_id for agent in agents]
+                print(f"{len(agent_ids)} agentes simulados conectados em {base_url}", file=sys.stderr)
+
+                report = {"config": vars(args), "scenarios": {}}
+                for scenario in args.scenarios.split(","):
+                    lag_before = await event_loop_lag(client)
+                    result = await drive(client, scenario, args.rate, args.duration, agent_ids, args.fanout)
+                    lag = histogram_delta(lag_before, await event_loop_lag(client))
+
+                    result["event_loop_lag_mean_ms"] = (lag["sum"] / lag["count"] * 1000) if lag["count"] else 0.0
+                    result["event_loop_lag_p99_ms"] = histogram_quantile(lag, 0.99) * 1000
+                    report["scenarios"][scenario] = result
+                    print(f"{scenario}: {json.dumps(result)}", file=sys.stderr)
+
+                stop.set()
+                await asyncio.gather(*agent_tasks, return_exceptions=True)
+                return report
+        finally:
+            stop.set()
+            if api is not None:
+                api.terminate()
+                api.wait(timeout=30)
+            for server, _ in fakes:
+                server.should_exit = True
+            await asyncio.gather(*(task for _, task in fakes), return_exceptions=True)
+
+def print_table(report: dict):
+    header = f"{'cenário':<20}{'req':>8}{'erros':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'lag p99':>10}"
+    print(header)
+    print("-" * len(header))
+    for scenario, result in report["scenarios"].items():
+        print(
+            f"{scenario:<20}{result['requests']:>8}{result['errors']:>8}{result['throughput_rps']:>10.1f}"
+            f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}{result['event_loop_lag_p99_ms']:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API já em execução (por padrão sobe uma instância local apontando para os substitutos)")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--scenarios", default="verify,fault,broadcast,find-fault-target")
+    parser.add_argument("--rate", type=float, default=50.0, help="requisições por segundo em cada cenário")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de carga por cenário")
+    parser.add_argument("--fanout", type=int, default=20, help="agentes por requisição no cenário broadcast")
+    parser.add_argument("--agent-latency", type=float, default=0.005)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--file-lines", type=int, default=2000)
+    parser.add_argument("--codec", choices=["json", "msgpack"], default="json", help="codec pedido pelos agentes simulados no registro")
+    parser.add_argument("--compression", action="store_true", help="agentes simulados oferecem compressão zlib")
+    parser.add_argument("--agent-max-inflight", type=int, default=64)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--warm-caches", action="store_true", help="mantém os caches de embedding e de LLM ligados")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--max-p99-ms", type=float, help="falha (exit 1) se algum cenário passar deste p99")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="falha (exit 1) se algum cenário passar desta taxa de erro")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_table(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failed = [
+        scenario for scenario, result in report["scenarios"].items()
+        if result["error_rate"] > args.max_error_rate
+        or (args.max_p99_ms is not None and result["p99_ms"] > args.max_p99_ms)
+    ]
+    if failed:
+        print(f"Limites excedidos em: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import ast
+import asyncio
+import hashlib
+import json
+import random
+import websockets
+import zlib
+
+def build_source_file(function_names: list, lines: int) -> list:
+    """Módulo Python sintético com as funções pedidas, preenchido até `lines` linhas"""
+    source = []
+    for name in function_names:
+        source += [f"def {name}(self, *args, **kwargs):", "    result = self._call(args, kwargs)", "    return result", ""]
+    while len(source) < lines:
+        source.append(f"VALUE_{len(source)} = {len(source)}")
+    return source
+
+class SimulatedAgent:
+    """Agente falso que fala o protocolo de /api/agent/connect e responde comandos por command_id"""
+
+    def __init__(self, agent_id: str, url: str, latency: float = 0.005, jitter: float = 0.002, file_lines: int = 2000,
+                 indexed_files: list = None, index_page_size: int = 100, ci_latency: float = 0.05,
+                 codecs: list = None, compression: list = None):
+        self.agent_id = agent_id
+        self.url = url
+        self.latency = latency
+        self.jitter = jitter
+        self.files = {}
+        self.file_lines = file_lines
+        self.indexed_files = indexed_files or []
+        self.index_page_size = index_page_size
+        self.ci_latency = ci_latency
+        self.codecs = codecs
+        self.compression = compression
+        self.protocol = {"codec": "json", "compression": None, "compression_threshold": 4096}
+        self.streams = {}
+        self.commands_handled = 0
+        self.registered = asyncio.Event()
+
+    def _get_file(self, file_path: str) -> list:
+        if file_path not in self.files:
+            self.files[file_path] = build_source_file(["_spawn", "_build_and_run_instance"], self.file_lines)
+        return self.files[file_path]
+
+    def _file_hash(self, file_path: str) -> str:
+        return hashlib.sha256("\n".join(self._get_file(file_path)).encode('utf-8')).hexdigest()
+
+    def _symbols(self, file_path: str) -> list:
+        tree = ast.parse("\n".join(self._get_file(file_path)))
+        return [
+            {"name": node.name, "qualname": node.name, "kind": "function", "start_line": node.lineno, "end_line": node.end_lineno}
+            for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        ]
+
+    def index_pages(self, command: dict) -> list:
+        """Entradas index_symbols dos arquivos novos/alterados, em páginas de index_page_size"""
+        known = command.get('known_files') or {}
+        files = [
+            {"path": path, "hash": self._file_hash(path), "symbols": self._symbols(path)}
+            for path in self.indexed_files if known.get(path) != self._file_hash(path)
+        ]
+        removed = [path for path in known if path not in self.indexed_files]
+
+        pages = [{"files": files[i:i + self.index_page_size]} for i in range(0, len(files), self.index_page_size)] or [{"files": []}]
+        pages[-1]["removed"] = removed
+        return pages
+
+    def _modify(self, file_path: str, line_number: int, new_content: str) -> dict:
+        lines = self._get_file(file_path)
+        if not 1 <= line_number <= len(lines):
+            return {"status": "error", "error": "line out of range"}
+        old_content = lines[line_number - 1]
+        lines[line_number - 1] = new_content
+        return {"status": "success", "line_number": line_number, "old_content": old_content, "new_content": new_content}
+
+    def handle(self, command: dict) -> dict:
+        action = command.get('action')
+        file_path = command.get('file_path', '/tmp/file.py')
+
+        if action == 'read_file':
+            lines = self._get_file(file_path)
+            line_number = command.get('line_number', 1)
+            return {"line_number": line_number, "content": lines[(line_number - 1) % len(lines)]}
+
+        if action == 'read_full_file':
+            file_hash = self._file_hash(file_path)
+            if command.get('known_hash') == file_hash:
+                return {"unchanged": True, "hash": file_hash}
+            lines = self._get_file(file_path)
+            data = {"content": "\n".join(lines), "hash": file_hash}
+            if command.get('include_lines', True):
+                data["lines"] = "\n".join(f"{idx + 1}: {line}" for idx, line in enumerate(lines))
+            return data
+
+        if action == 'modify_file':
+            return self._modify(file_path, command['line_number'], command['new_content'])
+
+        if action == 'modify_files':
+            return [self._modify(mod['file_path'], mod['line_number'], mod['new_content']) for mod in command['modifications']]
+
+        if action == 'run_tests':
+            # CI determinístico: o mesmo conteúdo mutado sempre mata (ou não) o mutante
+            killed = any(int(self._file_hash(path), 16) % 4 for path in command.get('files') or [file_path])
+            return {"status": "failed" if killed else "passed", "mutant_id": command.get('mutant_id')}
+
+        return {"status": "ok", "action": action}
+
+    def _encode(self, message: dict):
+        """Frame no protocolo negociado: texto JSON ou [flags][tamanho do command_id][command_id][payload]"""
+        codec, compression = self.protocol.get("codec"), self.protocol.get("compression")
+        if codec == "json" and not compression:
+            return json.dumps(message)
+
+        if codec == "msgpack":
+            import msgpack
+            payload = msgpack.packb(message, use_bin_type=True)
+        else:
+            payload = json.dumps(message).encode('utf-8')
+
+        flags = 0x02 if message.get("more") else 0
+        if compression == "zlib" and len(payload) >= self.protocol.get("compression_threshold", 4096):
+            payload = zlib.compress(payload, 1)
+            flags |= 0x01
+
+        command_id = str(message.get("command_id") or "").encode('utf-8')
+        return bytes((flags, len(command_id))) + command_id + payload
+
+    def _decode(self, frame) -> dict:
+        if isinstance(frame, str):
+            return json.loads(frame)
+
+        payload = frame[2 + frame[1]:]
+        if frame[0] & 0x01:
+            payload = zlib.decompress(payload)
+        if self.protocol.get("codec") == "msgpack":
+            import msgpack
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
+
+    async def _stream_file(self, websocket, command: dict):
+        """read_file_stream: partes numeradas de chunk_size, no máximo `window` sem stream_ack do servidor"""
+        command_id = command.get('command_id')
+        file_path = command.get('file_path', '/tmp/file.py')
+        file_hash = self._file_hash(file_path)
+        if command.get('known_hash') == file_hash:
+            await websocket.send(self._encode({"command_id": command_id, "data": {"unchanged": True, "hash": file_hash}}))
+            return
+
+        stream = self.streams[command_id] = {"acked": -1, "cancelled": False, "event": asyncio.Event()}
+        try:
+            content = "\n".join(self._get_file(file_path))
+            chunk_size = command.get('chunk_size') or 65536
+            window = command.get('window') or 4
+            chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+            for seq, chunk in enumerate(chunks):
+                while seq > stream["acked"] + window and not stream["cancelled"]:
+                    stream["event"].clear()
+                    await stream["event"].wait()
+                if stream["cancelled"]:
+                    return
+                await websocket.send(self._encode({"command_id": command_id, "more": True, "seq": seq, "data": {"chunk": chunk}}))
+
+            await websocket.send(self._encode({
+                "command_id": command_id,
+                "seq": len(chunks),
+                "data": {"hash": file_hash, "size": len(content.encode('utf-8'))}
+            }))
+        finally:
+            self.streams.pop(command_id, None)
+
+    def _flow_control(self, command: dict) -> bool:
+        """Trata stream_ack/cancel_stream do servidor; True se o comando era de controle de fluxo"""
+        if command.get('action') not in ('stream_ack', 'cancel_stream'):
+            return False
+
+        stream = self.streams.get(command.get('stream_id'))
+        if stream is not None:
+            if command['action'] == 'stream_ack':
+                stream["acked"] = max(stream["acked"], command.get('seq', -1))
+            else:
+                stream["cancelled"] = True
+            stream["event"].set()
+        return True
+
+    async def _reply(self, websocket, command: dict):
+        delay = max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0)
+        if command.get('action') == 'run_tests':
+            delay += self.ci_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if command.get('action') == 'read_file_stream':
+            await self._stream_file(websocket, command)
+        elif command.get('action') == 'index_symbols':
+            pages = self.index_pages(command)
+            for page in pages[:-1]:
+                await websocket.send(self._encode({"command_id": command.get('command_id'), "more": True, "data": page}))
+            await websocket.send(self._encode({"command_id": command.get('command_id'), "data": pages[-1]}))
+        else:
+            await websocket.send(self._encode({"command_id": command.get('command_id'), "data": self.handle(command)}))
+        self.commands_handled += 1
+
+    async def run(self, stop: asyncio.Event):
+        async with websockets.connect(self.url, max_size=None) as websocket:
+            registration = {
+                "agent_id": self.agent_id,
+                "name": f"Simulated {self.agent_id}",
+                "version": "bench",
+                "capabilities": ["modify_files", "index_symbols", "run_tests", "read_file_stream"]
+            }
+            if self.codecs or self.compression:
+                registration["protocol"] = {"codecs": self.codecs or ["json"], "compression": self.compression or []}
+
+            await websocket.send(json.dumps(registration))
+            self.protocol = json.loads(await websocket.recv()).get("protocol") or self.protocol
+            self.registered.set()
+
+            tasks = set()
+            receive = asyncio.ensure_future(websocket.recv())
+            stopped = asyncio.ensure_future(stop.wait())
+
+            while True:
+                done, _ = await asyncio.wait({receive, stopped}, return_when=asyncio.FIRST_COMPLETED)
+                if stopped in done:
+                    receive.cancel()
+                    break
+
+                command = self._decode(receive.result())
+                receive = asyncio.ensure_future(websocket.recv())
+                if self._flow_control(command):
+                    continue
+
+                task = asyncio.create_task(self._reply(websocket, command))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            for task in tasks:
+                task.cancel()
+
+async def start_agents(url: str, count: int, stop: asyncio.Event, **options) -> tuple:
+    """Conecta `count` agentes simulados e aguarda o registro de todos; retorna (agentes, tarefas)"""
+    agents = [SimulatedAgent(f"bench-agent-{idx:04d}", url, **options) for idx in range(count)]
+    tasks = [asyncio.create_task(agent.run(stop)) for agent in agents]
+
+    registered = asyncio.gather(*(agent.registered.wait() for agent in agents))
+    done, _ = await asyncio.wait({registered, *tasks}, return_when=asyncio.FIRST_COMPLETED)
+    if registered not in done:
+        registered.cancel()
+        for task in done:
+            task.result()
+
+    return agents, tasks
@@ -1,3 +1,4 @@
+import os
 import uvicorn
 
 if __name__ == "__main__":
@@ -5,6 +6,6 @@ if __name__ == "__main__":
       app="src.server:app", 
       host="0.0.0.0", 
       port=8000,
-      workers=1,
+      workers=int(os.environ.get("WORKERS", "1")), # >1 requires REDIS_URL (shared agent registry)
       reload=False, # Enable auto-reload for development
     )
\ No newline at end of file
@@ -1,3 +1,7 @@
 from src.app.api.controllers.agent_controller import router as AgentRouter
+from src.app.api.controllers.campaign_controller import router as CampaignRouter
+from src.app.api.controllers.health_controller import router as HealthRouter
+from src.app.api.controllers.job_controller import router as JobRouter
+from src.app.api.controllers.metrics_controller import router as MetricsRouter
 
-__all__ = ['AgentRouter']
\ No newline at end of file
+__all__ = ['AgentRouter', 'CampaignRouter', 'HealthRouter', 'JobRouter', 'MetricsRouter']
\ No newline at end of file
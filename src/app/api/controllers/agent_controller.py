@@ -1,6 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from src.app.api.schemas.requests import (
     InjectionFaultRequest, 
+    BatchInjectionFaultRequest,
+    BroadcastCommandRequest,
     VerifyLineRequest
 )
 from src.app.services import agent_service_instance
@@ -19,7 +21,9 @@ async def find_fault_target(agent_id: str, request: dict):
         if not user_query:
             raise HTTPException(status_code=400, detail="Query é obrigatória")
         
-        response = await service.llm_injection_fault(agent_id, user_query)
+        use_cache = request.get('use_cache', True)
+        
+        response = await service.llm_injection_fault(agent_id, user_query, use_cache=use_cache)
         
         return response        
     except Exception as e:
@@ -42,30 +46,62 @@ async def agent_websocket(websocket: WebSocket):
             return
         
         await service.register_agent(agent_id, websocket, reg_data)
-        await websocket.send_text(json.dumps({
-            'status': 'registered',
-            'agent_id': agent_id
-        }))
 
+        # Frames de texto (JSON) ou binários (codec negociado no registro)
         while True:
-            try:
-                message = await websocket.receive_text()
-                await service.handle_message(agent_id, message)
-            except WebSocketDisconnect:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
                 break
+
+            frame = message.get('bytes')
+            await service.handle_message(agent_id, frame if frame is not None else message.get('text'))
     except WebSocketDisconnect:
         pass
     finally:
         if agent_id:
-            await service.unregister_agent(agent_id)
+            await service.unregister_agent(agent_id, websocket)
 
 @router.get("/agents")
 async def list_agents():
+    agents = await service.list_agents()
+    return {
+        'agents': agents,
+        'total': len(agents)
+    }
+
+@router.post("/agents/{agent_id}/symbols/refresh")
+async def refresh_agent_symbols(agent_id: str):
+    """Atualiza o índice de símbolos do agente (só os arquivos alterados desde a última indexação)"""
+    if not await service.agent_supports(agent_id, 'index_symbols'):
+        raise HTTPException(status_code=400, detail="Agente não suporta index_symbols")
+
+    return await service.refresh_symbol_index(agent_id)
+
+@router.get("/agents/{agent_id}/symbols")
+async def find_agent_symbols(agent_id: str, name: str = None, file_path: str = None):
+    """Busca símbolos no índice do agente por nome e/ou arquivo"""
+    if not service.symbol_index.has_index(agent_id):
+        raise HTTPException(status_code=404, detail="Agente sem índice de símbolos")
+
+    symbols = service.symbol_index.find(agent_id, name=name, file_path=file_path)
     return {
-        'agents': service.agent_info,
-        'total': len(service.agent_info)
+        'symbols': symbols,
+        'total': len(symbols)
     }
 
+@router.post("/agents/broadcast")
+async def broadcast_command(request: BroadcastCommandRequest):
+    """Envia um comando a vários agentes (por id e/ou filtro sobre o registro) em paralelo"""
+    if 'action' not in request.command:
+        raise HTTPException(status_code=400, detail="command.action é obrigatório")
+
+    return await service.broadcast_command(
+        request.command,
+        agent_ids=request.agent_ids,
+        filters=request.filters,
+        max_concurrency=request.max_concurrency
+    )
+
 @router.post("/agents/{agent_id}/fault")
 async def agent_injection_fault(agent_id: str, request: InjectionFaultRequest): 
     command = {
@@ -81,6 +117,19 @@ async def agent_injection_fault(agent_id: str, request: InjectionFaultRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.post("/agents/{agent_id}/fault/batch")
+async def agent_batch_injection_fault(agent_id: str, request: BatchInjectionFaultRequest):
+    modifications = [mod.model_dump() for mod in request.modifications]
+
+    try:
+        results = await service.apply_modifications(agent_id, modifications)
+        return {
+            'results': results,
+            'total': len(results)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/agents/{agent_id}/verify")
 async def agent_verify_line(agent_id: str, request: VerifyLineRequest):
     command = {
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from src.app.api.schemas.requests import CampaignRequest, MutantResultRequest
+from src.app.services import campaign_service_instance
+import json
+
+router = APIRouter()
+
+service = campaign_service_instance
+
+@router.post("/campaigns", status_code=202)
+async def submit_campaign(request: CampaignRequest):
+    """Gera os mutantes uma vez e distribui aplicar → CI → reverter entre os agentes em segundo plano"""
+    if not request.query and request.target is None:
+        raise HTTPException(status_code=400, detail="Informe query ou target")
+
+    return await service.submit(
+        request.query,
+        target=request.target.model_dump() if request.target is not None else None,
+        mutants=request.mutants,
+        agent_ids=request.agent_ids,
+        filters=request.filters,
+        reference_agent_id=request.reference_agent_id,
+        signal=request.signal,
+        ci_action=request.ci_action,
+        ci_timeout=request.ci_timeout,
+        max_parallel=request.max_parallel,
+        use_cache=request.use_cache
+    )
+
+@router.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str):
+    return service.get_campaign(campaign_id)
+
+@router.get("/campaigns/{campaign_id}/events")
+async def stream_campaign_events(campaign_id: str):
+    """Server-Sent Events com o progresso da campanha, mutante por mutante, até o resumo final"""
+    service.get_campaign(campaign_id)
+
+    async def event_stream():
+        async for event in service.subscribe(campaign_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['campaign'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.post("/campaigns/{campaign_id}/mutants/{mutant_id}/result")
+async def report_mutant_result(campaign_id: str, mutant_id: str, request: MutantResultRequest):
+    """Resultado do CI externo para um mutante em execução (campanhas com signal=callback)"""
+    return service.report_result(campaign_id, mutant_id, request.outcome, request.details)
+
+@router.delete("/campaigns/{campaign_id}")
+async def cancel_campaign(campaign_id: str):
+    return service.cancel_campaign(campaign_id)
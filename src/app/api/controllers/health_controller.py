@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from src.app.services import job_service_instance, repository_instance
+
+router = APIRouter()
+
+@router.get("/health/live", include_in_schema=False)
+async def live():
+    """O processo está de pé e atendendo (agentes já podem se conectar)"""
+    return {'status': 'ok'}
+
+@router.get("/health/ready", include_in_schema=False)
+async def ready():
+    """200 quando a base de conhecimento está carregada; 503 com o progresso do aquecimento antes disso"""
+    body = {
+        'ready': repository_instance.ready,
+        'knowledge_base': {
+            **repository_instance.warmup,
+            'items_loaded': len(repository_instance.cache),
+            'items_indexed': len(repository_instance.knowledge)
+        },
+        'jobs_queued': job_service_instance.queue_depth()
+    }
+    return JSONResponse(body, status_code=200 if body['ready'] else 503)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from src.app.services import job_service_instance
+import json
+
+router = APIRouter()
+
+service = job_service_instance
+
+@router.post("/agents/{agent_id}/find-fault-target/jobs", status_code=202)
+async def submit_find_fault_target(agent_id: str, request: dict):
+    """Enfileira o pipeline find-fault-target e retorna o id do job imediatamente"""
+    user_query = request.get('query', '')
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query é obrigatória")
+
+    return await service.submit(agent_id, user_query, use_cache=request.get('use_cache', True))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return service.get_job(job_id)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events com o progresso do job, etapa por etapa, até o resultado final"""
+    service.get_job(job_id)
+
+    async def event_stream():
+        async for event in service.subscribe(job_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['job'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    return service.cancel_job(job_id)
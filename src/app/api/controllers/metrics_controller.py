@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from src.core.telemetry import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato de exposição do Prometheus"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
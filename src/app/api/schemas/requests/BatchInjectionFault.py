@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+from typing import List
+from .InjectionFault import InjectionFaultRequest
+
+class BatchInjectionFaultRequest(BaseModel):
+    modifications: List[InjectionFaultRequest] = Field(min_length=1)
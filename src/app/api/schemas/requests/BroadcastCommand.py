@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class BroadcastCommandRequest(BaseModel):
+    command: Dict[str, Any] = Field(example=[{"action": "read_file", "file_path": "/path/to/file", "line_number": 10}])
+
+    agent_ids: Optional[List[str]] = Field(default=None, example=[["agent-001", "agent-002"]])
+
+    filters: Optional[Dict[str, Any]] = Field(default=None, example=[{"version": "1.0.0"}])
+
+    max_concurrency: Optional[int] = Field(default=None, ge=1, example=[16])
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+class CampaignTarget(BaseModel):
+    file_path: str = Field(example=["/opt/stack/nova/nova/compute/manager.py"])
+
+    function: Optional[str] = Field(default=None, example=["_build_and_run_instance"])
+
+class CampaignRequest(BaseModel):
+    query: Optional[str] = Field(default=None, example=["Instance fails to spawn"])
+
+    target: Optional[CampaignTarget] = None
+
+    mutants: int = Field(default=10, ge=1, example=[20])
+
+    agent_ids: Optional[List[str]] = Field(default=None, example=[["agent-001", "agent-002"]])
+
+    filters: Optional[Dict[str, Any]] = Field(default=None, example=[{"version": "1.0.0"}])
+
+    reference_agent_id: Optional[str] = Field(default=None, example=["agent-001"])
+
+    signal: Literal["agent", "callback"] = "agent"
+
+    ci_action: str = Field(default="run_tests", example=["run_tests"])
+
+    ci_timeout: Optional[float] = Field(default=None, gt=0, example=[600])
+
+    max_parallel: Optional[int] = Field(default=None, ge=1, example=[8])
+
+    use_cache: bool = True
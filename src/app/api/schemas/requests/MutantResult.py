@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Literal, Optional
+
+class MutantResultRequest(BaseModel):
+    outcome: Literal["killed", "survived", "error"]
+
+    details: Optional[Dict[str, Any]] = Field(default=None, example=[{"failed_tests": 3, "build_url": "https://ci/build/42"}])
@@ -1,4 +1,8 @@
 from .InjectionFault import InjectionFaultRequest
+from .BatchInjectionFault import BatchInjectionFaultRequest
+from .BroadcastCommand import BroadcastCommandRequest
 from .VerifyLine import VerifyLineRequest
+from .Campaign import CampaignRequest
+from .MutantResult import MutantResultRequest
 
-__all__ = ["InjectionFaultRequest", "VerifyLineRequest"]
\ No newline at end of file
+__all__ = ["InjectionFaultRequest", "BatchInjectionFaultRequest", "BroadcastCommandRequest", "VerifyLineRequest", "CampaignRequest", "MutantResultRequest"]
@@ -1,3 +1,10 @@
+from .embedding_store import EmbeddingStore
+from .file_cache import AgentFileCache
+from .lexical_index import LexicalIndex
+from .llm_cache import LlmResponseCache
+from .query_cache import QueryEmbeddingCache
+from .similarity_index import SimilarityIndex
+from .symbol_index import SymbolIndex
 from .vector_repository import VectorRepository
 
-__all__ = ["VectorRepository"]
+__all__ = ["AgentFileCache", "EmbeddingStore", "LexicalIndex", "LlmResponseCache", "QueryEmbeddingCache", "SimilarityIndex", "SymbolIndex", "VectorRepository"]
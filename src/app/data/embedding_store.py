@@ -0,0 +1,62 @@
+import numpy as np
+import json
+import os
+
+class EmbeddingStore:
+    """Armazena os embeddings em disco como matriz float32 (.npy) com um sidecar JSON de metadados"""
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, base_path: str):
+        self.vectors_path = f"{base_path}.npy"
+        self.metadata_path = f"{base_path}.meta.json"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.vectors_path) and os.path.exists(self.metadata_path)
+
+    def save(self, items: list, vectors, model_name: str):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(items):
+            raise ValueError(f"Matriz {vectors.shape} incompatível com {len(items)} itens")
+
+        metadata = {
+            "version": self.FORMAT_VERSION,
+            "model": model_name,
+            "dimension": int(vectors.shape[1]),
+            "count": len(items),
+            "items": items
+        }
+
+        # Escrita atômica: um processo lendo o store nunca vê arquivos pela metade
+        vectors_tmp = f"{self.vectors_path}.tmp"
+        with open(vectors_tmp, 'wb') as f:
+            np.save(f, vectors)
+
+        metadata_tmp = f"{self.metadata_path}.tmp"
+        with open(metadata_tmp, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(metadata_tmp, self.metadata_path)
+
+    def load(self, model_name: str, dimension: int):
+        """Retorna (itens, vetores) com os vetores mapeados em memória, sem parse.
+
+        Lança ValueError se o store foi gerado por outro modelo ou com outra dimensão.
+        """
+        with open(self.metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        if metadata.get("version") != self.FORMAT_VERSION:
+            raise ValueError(f"Versão do store incompatível: {metadata.get('version')}")
+        if metadata.get("model") != model_name:
+            raise ValueError(f"Store gerado pelo modelo '{metadata.get('model')}', esperado '{model_name}'")
+        if metadata.get("dimension") != dimension:
+            raise ValueError(f"Store com dimensão {metadata.get('dimension')}, esperado {dimension}")
+
+        vectors = np.load(self.vectors_path, mmap_mode='r')
+
+        if vectors.dtype != np.float32 or vectors.shape != (metadata["count"], dimension):
+            raise ValueError(f"Matriz {vectors.dtype}{vectors.shape} não corresponde aos metadados")
+
+        return metadata["items"], vectors
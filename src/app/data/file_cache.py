@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+class AgentFileCache:
+    """Cache LRU do conteúdo de arquivos lidos dos agentes, por (agente, caminho), limitado em bytes.
+
+    Só guarda leituras com validador (hash e/ou mtime informados pelo agente), que é
+    reenviado na próxima leitura para o agente responder apenas "unchanged".
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, agent_id: str, file_path: str):
+        entry = self._entries.get((agent_id, file_path))
+        if entry is not None:
+            self._entries.move_to_end((agent_id, file_path))
+        return entry
+
+    def put(self, agent_id: str, file_path: str, data: dict):
+        if not (data.get('hash') or data.get('mtime')):
+            return
+
+        # Tamanho aproximado pelos campos de texto (o conteúdo domina), sem serializar a resposta
+        size = sum(len(value) for value in data.values() if isinstance(value, str))
+        if size > self.max_bytes:
+            self.invalidate(agent_id, file_path)
+            return
+
+        self.invalidate(agent_id, file_path)
+        self._entries[(agent_id, file_path)] = {
+            'hash': data.get('hash'),
+            'mtime': data.get('mtime'),
+            'data': data,
+            'size': size
+        }
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted['size']
+
+    def invalidate(self, agent_id: str, file_path: str = None):
+        """Remove o arquivo do agente do cache, ou todos os arquivos dele se file_path for None"""
+        keys = [(agent_id, file_path)] if file_path is not None else [key for key in self._entries if key[0] == agent_id]
+
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry['size']
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
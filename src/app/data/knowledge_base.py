@@ -0,0 +1,63 @@
+import json
+import os
+
+KNOWLEDGE_FILE_EXTENSIONS = ('.jsonl', '.yaml', '.yml')
+
+def _knowledge_files(path: str) -> list:
+    if os.path.isfile(path):
+        return [path]
+
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        files += [os.path.join(root, name) for name in sorted(names) if name.endswith(KNOWLEDGE_FILE_EXTENSIONS)]
+
+    return files
+
+def _iter_jsonl(file_path: str):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Linha {line_number} inválida em {file_path}: {e}")
+
+def _iter_yaml(file_path: str):
+    try:
+        import yaml
+    except ImportError:
+        print(f"PyYAML não instalado, ignorando {file_path}")
+        return
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        # Um item por documento ("---") ou uma lista de itens por documento
+        for document in yaml.safe_load_all(f):
+            if isinstance(document, list):
+                yield from document
+            elif document is not None:
+                yield document
+
+def iter_knowledge_items(path: str):
+    """Lê a base de conhecimento item a item (sem carregar os arquivos inteiros), em ordem estável.
+
+    `path` é um arquivo ou diretório com .jsonl (um objeto por linha) e .yaml/.yml.
+    Itens sem "file" são descartados; "functions" vira sempre uma lista.
+    """
+    if not os.path.exists(path):
+        print(f"Base de conhecimento não encontrada em {path}")
+        return
+
+    for file_path in _knowledge_files(path):
+        reader = _iter_yaml if file_path.endswith(('.yaml', '.yml')) else _iter_jsonl
+
+        for item in reader(file_path):
+            if not isinstance(item, dict) or not item.get('file'):
+                print(f"Item sem 'file' ignorado em {file_path}")
+                continue
+
+            functions = item.get('functions') or []
+            yield {**item, 'functions': [functions] if isinstance(functions, str) else list(functions)}
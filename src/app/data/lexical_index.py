@@ -0,0 +1,121 @@
+from collections import Counter
+import numpy as np
+import re
+
+WORD_PATTERN = re.compile(r'[\w./-]+')
+SEPARATOR_PATTERN = re.compile(r'[_./-]+')
+
+# Peso de cada campo do item da base: identificadores contam mais que texto livre
+FIELD_WEIGHTS = {
+    "file": 2.0,
+    "functions": 3.0,
+    "description": 1.0,
+    "fault_scenarios": 1.0
+}
+
+def tokenize(text: str) -> list:
+    """Palavras em minúsculas; identificadores e caminhos também entram por partes
+    ("_build_and_run_instance" → + build, and, run, instance; "nova/virt/libvirt/driver.py" → + nova, virt, libvirt, driver, py)
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        word = word.strip('./-')
+        if not word:
+            continue
+        tokens.append(word)
+
+        if not word.isalnum():
+            tokens += [part for part in SEPARATOR_PATTERN.split(word) if part]
+
+    return tokens
+
+def _field_text(value) -> str:
+    return ' '.join(value) if isinstance(value, list) else str(value or '')
+
+class LexicalIndex:
+    """Índice invertido BM25 sobre os campos file, functions, description e fault_scenarios.
+
+    As linhas seguem a ordem dos itens usados no build (a base inteira, com ou sem embedding).
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.symbols = set()
+        self.size = 0
+        self._rows = np.empty(0, dtype=np.int64)
+        self._weights = np.empty(0, dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def build(self, documents: list):
+        """Monta as postings em arrays planos (linhas e pesos agrupados por termo, com offsets)"""
+        vocabulary = {}
+        term_ids, rows, tfs = [], [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        symbols = set()
+
+        for row, document in enumerate(documents):
+            term_weights = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(_field_text(document.get(field))):
+                    term_weights[token] += weight
+
+            for term, tf in term_weights.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                rows.append(row)
+                tfs.append(tf)
+            lengths[row] = sum(term_weights.values())
+
+            symbols.update(name.lower() for name in document.get('functions', []))
+            if document.get('file'):
+                path = document['file'].lower()
+                symbols.add(path)
+                symbols.update(part for part in re.split(r'[/.]+', path) if part and part != 'py')
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        tfs = np.asarray(tfs, dtype=np.float32)
+
+        # Parte do BM25 que não depende da consulta (idf × saturação do tf) já fica pré-calculada
+        average_length = float(lengths.mean()) if len(documents) else 0.0
+        norm = self.k1 * (1 - self.b + self.b * lengths[rows] / max(average_length, 1e-9))
+        document_frequency = np.bincount(term_ids, minlength=len(vocabulary))
+        idf = np.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        weights = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + norm)
+
+        order = np.argsort(term_ids, kind='stable')
+        self.vocabulary = vocabulary
+        self.symbols = symbols
+        self.size = len(documents)
+        self._rows = rows[order]
+        self._weights = weights[order].astype(np.float32)
+        self._offsets = np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64)
+
+    def is_symbol_query(self, query: str) -> bool:
+        """True quando a consulta é só identificadores conhecidos (funções, caminhos, módulos)"""
+        words = [word.strip('./-') for word in WORD_PATTERN.findall(query.lower())]
+        words = [word for word in words if word]
+        return bool(words) and all(word in self.symbols for word in words)
+
+    def search(self, query: str, top_k: int = 5):
+        """Retorna (linhas, scores BM25) dos top_k itens com algum termo da consulta, em ordem decrescente"""
+        if self.size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, end = self._offsets[term_id], self._offsets[term_id + 1]
+                scores[self._rows[start:end]] += self._weights[start:end]
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+
+        rows = matched[np.argsort(scores[matched])[::-1]]
+        return rows, scores[rows]
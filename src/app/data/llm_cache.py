@@ -0,0 +1,115 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+class LlmResponseCache:
+    """Cache persistente (SQLite) de respostas do LLM, endereçado pelo hash de modelo + prompts.
+
+    As chamadas são bloqueantes (disco): quem está no event loop as chama via asyncio.to_thread.
+    O accessed_at dos hits fica em memória e é gravado em lote (no próximo put, a cada
+    touch_batch hits ou no close), para um hit não custar uma escrita com fsync.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, touch_batch: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._lock = threading.Lock()
+        self._touched = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, system_prompt, user_prompt):
+            encoded = part.encode('utf-8')
+            # Prefixo de tamanho evita colisões entre partes concatenadas
+            digest.update(len(encoded).to_bytes(8, 'big'))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_accessed ON llm_responses (accessed_at)")
+            self._connection.commit()
+
+        return self._connection
+
+    def _flush_touched(self, connection: sqlite3.Connection):
+        """Grava os accessed_at pendentes (sem commit; quem chama faz)"""
+        if self._touched:
+            connection.executemany(
+                "UPDATE llm_responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            connection = self._get_connection()
+            row = connection.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched(connection)
+                connection.commit()
+
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            connection = self._get_connection()
+            # Acessos pendentes entram antes da remoção, para ela respeitar a ordem real de uso
+            self._flush_touched(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            # Remove as entradas acessadas há mais tempo além do limite
+            connection.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            connection.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_entries": self.max_entries,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._flush_touched(self._connection)
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
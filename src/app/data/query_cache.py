@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import numpy as np
+import unicodedata
+import time
+import os
+
+class QueryEmbeddingCache:
+    """Cache LRU com TTL dos embeddings de consultas, chaveado por (modelo, consulta normalizada)"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 86400.0, path: str = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+        if self.path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+    def _key(self, model_name: str, query: str) -> tuple:
+        return (model_name, self.normalize_query(query))
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def get(self, model_name: str, query: str):
+        key = self._key(model_name, query)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        created_at, embedding = entry
+        if self._expired(created_at, time.time()):
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return embedding
+
+    def put(self, model_name: str, query: str, embedding, created_at: float = None):
+        if self.max_size <= 0:
+            return
+
+        key = self._key(model_name, query)
+        self._entries[key] = (created_at or time.time(), np.asarray(embedding, dtype=np.float32))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def save(self):
+        if not self.path:
+            return
+
+        now = time.time()
+        entries = [(key, entry) for key, entry in self._entries.items() if not self._expired(entry[0], now)]
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                models=np.array([key[0] for key, _ in entries], dtype=str),
+                queries=np.array([key[1] for key, _ in entries], dtype=str),
+                created_at=np.array([entry[0] for _, entry in entries], dtype=np.float64),
+                vectors=np.array([entry[1] for _, entry in entries], dtype=np.float32)
+            )
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with np.load(self.path) as data:
+                rows = zip(data["models"], data["queries"], data["created_at"], data["vectors"])
+                for model_name, query, created_at, vector in rows:
+                    if not self._expired(float(created_at), time.time()):
+                        self.put(str(model_name), str(query), vector, created_at=float(created_at))
+        except Exception as e:
+            print(f"Erro ao carregar cache de consultas {self.path}: {e}")
+            self._entries.clear()
@@ -0,0 +1,123 @@
+import numpy as np
+
+class SimilarityIndex:
+    """Busca por similaridade de cosseno sobre uma matriz normalizada.
+
+    A partir de `ann_min_items` itens monta um índice IVF (k-means esférico em NumPy): a consulta
+    só é comparada com os itens das `n_probe` listas de centróides mais próximos. Mais listas
+    sondadas = mais recall e mais latência; abaixo do limite a busca é exata.
+    """
+
+    def __init__(self, ann_min_items: int = 4096, n_lists: int = 0, n_probe: int = 8, kmeans_iterations: int = 10):
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.ann_min_items = ann_min_items
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.centroids = None
+        self._list_rows = None
+        self._list_offsets = None
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1]
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+    def build(self, embeddings, normalized: bool = False):
+        """Armazena os embeddings como uma única matriz float32 normalizada (uma linha por item).
+
+        Com normalized=True a matriz é usada como está, sem cópia (ex.: um memmap do EmbeddingStore).
+        """
+        self.centroids = None
+        self._list_rows = None
+        self._list_offsets = None
+
+        if len(embeddings) == 0:
+            self.matrix = np.empty((0, 0), dtype=np.float32)
+            return
+
+        if normalized:
+            self.matrix = np.asarray(embeddings, dtype=np.float32)
+        else:
+            self.matrix = np.ascontiguousarray(self.normalize(embeddings))
+
+        if self.ann_min_items > 0 and len(self) >= self.ann_min_items:
+            self._build_ivf()
+
+    def _assign(self, vectors, centroids, chunk_size: int = 65536) -> np.ndarray:
+        """Centróide mais próximo de cada vetor, em blocos para não materializar a matriz inteira"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _build_ivf(self):
+        count = len(self)
+        n_lists = self.n_lists or int(round(np.sqrt(count)))
+        n_lists = max(1, min(n_lists, count))
+
+        # k-means esférico treinado em uma amostra (~64 pontos por lista), semente fixa
+        rng = np.random.default_rng(0)
+        sample_size = min(count, n_lists * 64)
+        sample = np.asarray(self.matrix[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(sample, centroids)
+            order = np.argsort(assignments, kind='stable')
+            lists, starts = np.unique(assignments[order], return_index=True)
+
+            # Listas que ficaram vazias mantêm o centróide anterior
+            centroids[lists] = self.normalize(np.add.reduceat(sample[order], starts, axis=0))
+
+        assignments = self._assign(self.matrix, centroids)
+        self._list_rows = np.argsort(assignments, kind='stable')
+        self._list_offsets = np.searchsorted(assignments[self._list_rows], np.arange(n_lists + 1))
+        self.centroids = centroids
+
+    def _candidate_rows(self, query: np.ndarray, n_probe: int):
+        """Linhas das n_probe listas IVF mais próximas da consulta, ou None para busca exata"""
+        if self.centroids is None or n_probe >= len(self.centroids):
+            return None
+
+        lists = np.argpartition(self.centroids @ query, -n_probe)[-n_probe:]
+        rows = np.concatenate([self._list_rows[self._list_offsets[idx]:self._list_offsets[idx + 1]] for idx in lists])
+        return np.sort(rows)
+
+    def search(self, query_embedding, top_k: int = 5, n_probe: int = None):
+        """Retorna (linhas, similaridades) dos top_k itens mais similares, em ordem decrescente"""
+        if len(self) == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = self.normalize(query_embedding)
+        if query.shape != (self.dimension,):
+            raise ValueError(f"Dimensão da consulta {query.shape} incompatível com o índice ({self.dimension},)")
+
+        candidates = self._candidate_rows(query, n_probe or self.n_probe)
+        if candidates is not None and len(candidates) < top_k:
+            candidates = None
+
+        if candidates is None:
+            scores = self.matrix @ query
+            candidates = np.arange(len(scores))
+        else:
+            scores = self.matrix[candidates] @ query
+
+        k = min(top_k, len(scores))
+
+        if k < len(scores):
+            rows = np.argpartition(scores, -k)[-k:]
+        else:
+            rows = np.arange(len(scores))
+
+        rows = rows[np.argsort(scores[rows])[::-1]]
+        return candidates[rows], scores[rows]
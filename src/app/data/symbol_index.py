@@ -0,0 +1,152 @@
+def function_names(functions) -> set:
+    """Nomes de função de um alvo do LLM ("a, b", "a; b" ou lista)"""
+    if isinstance(functions, str):
+        functions = functions.replace(';', ',').split(',')
+
+    # "Classe.metodo" casa pelo nome do método
+    return {name.strip().split('.')[-1] for name in functions or [] if name and name.strip()}
+
+def _common_suffix(path_a: str, path_b: str) -> int:
+    """Quantos componentes finais de caminho os dois têm em comum"""
+    parts_a, parts_b = path_a.strip('/').split('/'), path_b.strip('/').split('/')
+    count = 0
+    while count < min(len(parts_a), len(parts_b)) and parts_a[-1 - count] == parts_b[-1 - count]:
+        count += 1
+    return count
+
+class SymbolIndex:
+    """Índice de símbolos (módulos, classes, funções e intervalos de linhas) do checkout de cada agente.
+
+    Montado a partir da ação index_symbols: o agente recebe os hashes que o servidor já conhece
+    e só envia os arquivos novos ou alterados, mais a lista dos removidos.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._by_name = {}
+
+    def has_index(self, agent_id: str) -> bool:
+        return agent_id in self._files
+
+    def known_hashes(self, agent_id: str) -> dict:
+        return {path: entry['hash'] for path, entry in self._files.get(agent_id, {}).items() if entry['hash']}
+
+    def update(self, agent_id: str, files: list = None, removed: list = None):
+        agent_files = self._files.setdefault(agent_id, {})
+        by_name = self._by_name.setdefault(agent_id, {})
+
+        for path in removed or []:
+            self._drop_file(agent_id, path)
+
+        for entry in files or []:
+            path = entry['path']
+            self._drop_file(agent_id, path)
+
+            symbols = [
+                {
+                    'name': symbol['name'],
+                    'qualname': symbol.get('qualname', symbol['name']),
+                    'kind': symbol.get('kind', 'function'),
+                    'start_line': symbol.get('start_line'),
+                    'end_line': symbol.get('end_line')
+                }
+                for symbol in entry.get('symbols', [])
+            ]
+            agent_files[path] = {'hash': entry.get('hash'), 'symbols': symbols}
+            for symbol in symbols:
+                by_name.setdefault(symbol['name'], set()).add(path)
+
+    def _drop_file(self, agent_id: str, path: str):
+        entry = self._files.get(agent_id, {}).pop(path, None)
+        if entry is None:
+            return
+
+        by_name = self._by_name.get(agent_id, {})
+        for symbol in entry['symbols']:
+            paths = by_name.get(symbol['name'])
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del by_name[symbol['name']]
+
+    def mark_stale(self, agent_id: str, path: str):
+        """Arquivo modificado pelo servidor: os símbolos ficam, mas o próximo refresh o pede de novo"""
+        entry = self._files.get(agent_id, {}).get(path)
+        if entry is not None:
+            entry['hash'] = None
+
+    def match_path(self, agent_id: str, file_path: str):
+        """Caminho exato no checkout ou, se não houver, o único com o maior sufixo em comum"""
+        files = self._files.get(agent_id, {})
+        if not file_path:
+            return None
+        if file_path in files:
+            return file_path
+
+        # Só o nome do arquivo não basta ("manager.py" existe em vários serviços), a menos que seja tudo o que veio
+        required = min(2, len(file_path.strip('/').split('/')))
+        scored = [(_common_suffix(file_path, path), path) for path in files]
+        best = max((score for score, _ in scored), default=0)
+        matches = [path for score, path in scored if score == best]
+
+        return matches[0] if best >= required and len(matches) == 1 else None
+
+    def find(self, agent_id: str, name: str = None, file_path: str = None) -> list:
+        """Símbolos com esse nome e/ou no arquivo informado"""
+        files = self._files.get(agent_id, {})
+
+        if file_path is not None:
+            path = self.match_path(agent_id, file_path)
+            paths = [path] if path is not None else []
+        elif name is not None:
+            paths = sorted(self._by_name.get(agent_id, {}).get(name, ()))
+        else:
+            paths = sorted(files)
+
+        return [
+            {'file_path': path, **symbol}
+            for path in paths
+            for symbol in files[path]['symbols']
+            if name is None or symbol['name'] == name
+        ]
+
+    def resolve(self, agent_id: str, file_path: str, functions):
+        """Confere um alvo (arquivo + funções) contra o checkout do agente.
+
+        Retorna {'file_path', 'functions', 'symbols', 'corrected'} com o caminho real e só as
+        funções que existem nele; se nenhuma existir no arquivo, procura as mesmas funções no
+        arquivo de caminho mais parecido. None quando nada do alvo existe no checkout.
+        """
+        names = function_names(functions)
+        files = self._files.get(agent_id, {})
+
+        path = self.match_path(agent_id, file_path)
+        if path is not None:
+            symbols = [symbol for symbol in files[path]['symbols'] if symbol['name'] in names]
+            if symbols:
+                return self._resolved(path, symbols, corrected=path != file_path)
+
+        by_name = self._by_name.get(agent_id, {})
+        candidates = {candidate for name in names for candidate in by_name.get(name, ())}
+        if not candidates:
+            return None
+
+        path = max(sorted(candidates), key=lambda candidate: _common_suffix(file_path or '', candidate))
+        symbols = [symbol for symbol in files[path]['symbols'] if symbol['name'] in names]
+        return self._resolved(path, symbols, corrected=True)
+
+    def _resolved(self, path: str, symbols: list, corrected: bool) -> dict:
+        return {
+            'file_path': path,
+            'functions': list(dict.fromkeys(symbol['name'] for symbol in symbols)),
+            'symbols': symbols,
+            'corrected': corrected
+        }
+
+    def stats(self, agent_id: str = None) -> dict:
+        agents = [agent_id] if agent_id is not None else list(self._files)
+        return {
+            'agents': len([agent for agent in agents if agent in self._files]),
+            'files': sum(len(self._files.get(agent, {})) for agent in agents),
+            'symbols': sum(len(entry['symbols']) for agent in agents for entry in self._files.get(agent, {}).values())
+        }
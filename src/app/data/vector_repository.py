@@ -1,224 +1,462 @@
 import numpy as np
-import requests
-from src.core import Factory
-import time
+from src.core import Factory, SingleFlight
+from src.app.data.embedding_store import EmbeddingStore
+from src.app.data.knowledge_base import iter_knowledge_items
+from src.app.data.lexical_index import LexicalIndex
+from src.app.data.query_cache import QueryEmbeddingCache
+from src.app.data.similarity_index import SimilarityIndex
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
 import json
 import os
 
+LEGACY_EMBEDDINGS_FILE = 'openstack_knowledge_embeddings.json'
+
 class VectorRepository:
     def __init__(self):
         self.factory = Factory()
+        # Toda a base (linhas do índice lexical); cache são só os itens com embedding (linhas do índice denso)
+        self.knowledge = []
         self.cache = []
-        self.OPENSTACK_KNOWLEDGE_BASE = [
-            {
-                "file": "/opt/stack/nova/nova/compute/manager.py",
-                "functions": ["_build_and_run_instance", "_spawn", "_allocate_network", "_shutdown_instance", "_init_instance", "_build_resources", "_cleanup_volumes", "_cleanup_allocated_networks", "_prep_block_device"],
-                "description": "Nova Compute Manager - Núcleo do gerenciamento de instâncias. Controla todo o ciclo de vida das VMs incluindo criação, destruição e operações de runtime.",
-                "fault_scenarios": "falha na criação de instâncias, erro de spawn, timeout de rede, falha na alocação de recursos, erro de boot, problema de cleanup"
-            },
-            {
-                "file": "/opt/stack/nova/nova/api/openstack/compute/servers.py",
-                "functions": ["create", "delete", "update", "rebuild", "resize", "_action_reboot", "_action_rebuild", "_start", "_stop", "show"],
-                "description": "Nova API Servers - Interface REST para operações de servidor. Valida requisições e direciona para os serviços apropriados.",
-                "fault_scenarios": "validação falhou, quota excedida, request inválido, timeout de API, erro de autenticação, request malformado"
-            },
-            {
-                "file": "/opt/stack/nova/nova/scheduler/manager.py",
-                "functions": ["select_destinations", "_schedule", "_get_sorted_hosts", "_get_all_host_states", "_consume_selected_host"],
-                "description": "Nova Scheduler Manager - Responsável pela seleção de hosts para instâncias. Aplica filtros e pesos para determinar o melhor host.",
-                "fault_scenarios": "nenhum host válido, recursos insuficientes, falha de filtros, host indisponível, erro de alocação, falha de agendamento, erro de placement"
-            },
-            {
-                "file": "/opt/stack/nova/nova/virt/libvirt/driver.py",
-                "functions": ["spawn", "destroy", "reboot", "power_off", "power_on", "_create_domain", "_get_guest", "_hard_reboot", "_create_image", "_get_guest_xml"],
-                "description": "LibVirt Driver - Interface com hypervisor LibVirt. Executa operações de baixo nível nas VMs.",
-                "fault_scenarios": "falha do libvirt, VM não responde, erro de domínio, falha de attach de dispositivo, erro de configuração XML, problema com imagem"
-            },
-            {
-                "file": "/opt/stack/nova/nova/network/neutron.py",
-                "functions": ["allocate_for_instance", "deallocate_for_instance", "setup_instance_network_on_host", "bind_ports", "_create_port", "_delete_port"],
-                "description": "Neutron Network API - Interface com serviço Neutron para operações de rede. Gerencia ports, security groups e floating IPs.",
-                "fault_scenarios": "falha de alocação de IP, erro de binding de porta, timeout do Neutron, security group falhou, rede indisponível, porta não pode ser criada"
-            },
-            {
-                "file": "/opt/stack/nova/nova/volume/cinder.py",
-                "functions": ["attach_volume", "create_volume", "detach_volume", "initialize_connection", "terminate_connection"],
-                "description": "Cinder Integration - Gerencia volumes de armazenamento para instâncias.",
-                "fault_scenarios": "falha no volume, storage não disponível, erro de attachment, conexão não estabelecida, detach falhou"
-            },
-            {
-                "file": "/opt/stack/nova/nova/conductor/manager.py",
-                "functions": ["build_instances", "schedule_and_build_instances", "rebuild_instance", "migrate_server", "live_migrate_instance", "_cold_migrate", "_reschedule"],
-                "description": "Nova Conductor Manager - Orquestra operações complexas entre compute e scheduler. Gerencia migrações e rebuild de instâncias.",
-                "fault_scenarios": "falha de scheduling, erro de migração, rebuild falhou, reschedule loop, timeout de operação, perda de comunicação, falha de orquestração"
-            },
-            {
-                "file": "/opt/stack/nova/nova/compute/api.py",
-                "functions": ["create", "delete", "rebuild", "resize", "shelve", "unshelve", "_check_requested_networks", "_validate_flavor", "_provision_instances"],
-                "description": "Compute API - Interface de alto nível para operações compute. Validação e orquestração de operações complexas.",
-                "fault_scenarios": "validação de flavor falhou, rede inválida, imagem não encontrada, quota excedida, estado inválido, flavor incompatível"
-            },
-            {
-                "file": "/opt/stack/nova/nova/compute/resource_tracker.py",
-                "functions": ["instance_claim", "rebuild_claim", "resize_claim", "update_available_resource", "_update_usage_from_instances", "_verify_resources"],
-                "description": "Resource Tracker - Rastreia recursos disponíveis no compute node. Gerencia claims de CPU, memória e disco.",
-                "fault_scenarios": "recursos insuficientes, claim falhou, inconsistência de recursos, overflow de memória, disco cheio, CPU/RAM indisponível"
-            },
-            {
-                "file": "/opt/stack/nova/nova/objects/instance.py",
-                "functions": ["save", "create", "destroy", "refresh", "get_by_uuid", "_from_db_object", "_save_flavor", "_save_info_cache"],
-                "description": "Instance Object - Modelo de dados ORM para instâncias. Gerencia persistência e estado no banco de dados.",
-                "fault_scenarios": "erro de banco de dados, inconsistência de estado, lock timeout, objeto não encontrado, erro de serialização"
-            },
-            {
-                "file": "/opt/stack/nova/nova/compute/rpcapi.py",
-                "functions": ["build_and_run_instance", "terminate_instance", "rebuild_instance", "resize_instance", "live_migration", "prep_resize"],
-                "description": "Compute RPC API - Interface RPC para comunicação com compute nodes. Envia comandos assíncronos via message queue.",
-                "fault_scenarios": "timeout RPC, mensagem perdida, compute node offline, versão incompatível, falha de cast"
-            },
-            {
-                "file": "/opt/stack/nova/nova/scheduler/filter_scheduler.py",
-                "functions": ["schedule", "_get_sorted_hosts", "_schedule", "_get_all_host_states", "_get_hosts_by_request_spec"],
-                "description": "Filter Scheduler - Implementação do algoritmo de scheduling com filtros e pesos. Seleciona hosts baseado em critérios configuráveis.",
-                "fault_scenarios": "todos hosts filtrados, peso inválido, falha de agregado, anti-affinity violado, sem hosts disponíveis"
-            },
+        self.dense_rows = np.empty(0, dtype=np.int64)
+        self.ann_min_items = int(os.environ.get("ANN_MIN_ITEMS", "4096"))
+        self.ann_lists = int(os.environ.get("ANN_LISTS", "0"))
+        self.ann_probes = int(os.environ.get("ANN_PROBES", "8"))
+        self.index = self._new_similarity_index()
+        self.lexical_index = LexicalIndex()
+        self.retrieval_mode = os.environ.get("RETRIEVAL_MODE", "hybrid").lower()
+        self.rrf_k = float(os.environ.get("RETRIEVAL_RRF_K", "60"))
+        self.store = EmbeddingStore(os.environ.get("EMBEDDINGS_PATH", "openstack_knowledge_embeddings"))
+        self.query_cache = QueryEmbeddingCache(
+            max_size=int(os.environ.get("QUERY_CACHE_SIZE", "256")),
+            ttl=float(os.environ.get("QUERY_CACHE_TTL", "86400")),
+            path=os.environ.get("QUERY_CACHE_PATH")
+        )
+        # Consultas iguais e simultâneas geram um único embedding
+        self.query_flight = SingleFlight()
+        self.knowledge_base_path = os.environ.get("KNOWLEDGE_BASE_PATH", "knowledge_base")
+        self.ingest_chunk_size = int(os.environ.get("KNOWLEDGE_INGEST_CHUNK", "512"))
+        # Depois de um aquecimento com falha, a nova tentativa roda em segundo plano com backoff
+        self.warmup_retry_delay = float(os.environ.get("WARMUP_RETRY_DELAY", "30"))
+        self.warmup_retry_max = float(os.environ.get("WARMUP_RETRY_MAX", "600"))
+        self._retry_delay = self.warmup_retry_delay
+        self._retry_handle = None
+        self._warmup_failed = False
+        self._warmup_task = None
+        self._knowledge_loaded = asyncio.Event()
+        self.warmup = {
+            'status': 'pending',
+            'stage': None,
+            'items_processed': 0,
+            'items_embedded': 0,
+            'started_at': None,
+            'finished_at': None,
+            'next_retry_at': None,
+            'error': None
+        }
+
+    def _new_similarity_index(self) -> SimilarityIndex:
+        return SimilarityIndex(ann_min_items=self.ann_min_items, n_lists=self.ann_lists, n_probe=self.ann_probes)
+
+    @property
+    def ready(self) -> bool:
+        """Há índices carregados para buscar (mesmo que um novo aquecimento esteja em andamento)"""
+        return bool(self.cache)
+
+    def start_warmup(self) -> asyncio.Task:
+        """Carrega/reconstrói os embeddings em segundo plano; chamadas repetidas reaproveitam a mesma tarefa.
+        Se ela falhar, a próxima tentativa é agendada com backoff, não disparada por cada consulta
+        """
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self._run_warmup())
+        return self._warmup_task
+
+    def _retry_warmup(self):
+        self._retry_handle = None
+        if not self.ready and self._warmup_task.done():
+            self._warmup_task = asyncio.create_task(self._run_warmup())
+
+    def _schedule_retry(self):
+        delay = self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, self.warmup_retry_max)
+        self.warmup['next_retry_at'] = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        self._retry_handle = asyncio.get_running_loop().call_later(delay, self._retry_warmup)
+        print(f"Nova tentativa de aquecimento em {delay:g}s")
+
+    async def _run_warmup(self):
+        self.warmup.update({
+            'status': 'warming',
+            'stage': None,
+            'items_processed': 0,
+            'items_embedded': 0,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'next_retry_at': None,
+            'error': None
+        })
+
+        try:
+            await self.initialize_embeddings()
+        except asyncio.CancelledError:
+            self.warmup['status'] = 'pending'
+            raise
+        except Exception as e:
+            print(f"Erro ao inicializar embeddings: {e}")
+            self.warmup.update({'status': 'failed', 'error': str(e)})
+        else:
+            # Base vazia (ex.: embedding fora do ar) conta como falha e também é tentada de novo
+            self.warmup.update({'status': 'ready' if self.cache else 'failed', 'stage': None})
+        finally:
+            self._knowledge_loaded.set()
+            self.warmup['finished_at'] = datetime.now().isoformat()
+
+        self._warmup_failed = self.warmup['status'] == 'failed'
+        if self._warmup_failed:
+            self._schedule_retry()
+        else:
+            self._retry_delay = self.warmup_retry_delay
+
+    async def wait_ready(self) -> bool:
+        """Espera o primeiro aquecimento (iniciando-o se preciso) sem cancelá-lo se quem espera for cancelado.
+        Depois de uma falha não espera a nova tentativa, que roda em segundo plano
+        """
+        if not self.ready and not self._warmup_failed:
+            await asyncio.shield(self.start_warmup())
+        return self.ready
+
+    async def wait_knowledge(self) -> bool:
+        """Espera só a leitura da base e o índice lexical, sem esperar os embeddings"""
+        if not self.knowledge and not self._knowledge_loaded.is_set():
+            self.start_warmup()
+            await self._knowledge_loaded.wait()
+        return bool(self.knowledge)
+
+    async def generate_embedding(self, text: str):
+        return (await self.generate_embeddings([text]))[0]
+
+    async def generate_embeddings(self, texts: list) -> list:
+        """Gera embeddings para vários textos de uma vez pelo backend configurado; None para os que falharem"""
+        return await self.factory.get_embedding_model().embed(texts)
+
+    async def get_query_embedding(self, query: str):
+        model_name = self.factory.get_embedding_model().name
+
+        embedding = self.query_cache.get(model_name, query)
+        if embedding is not None:
+            return embedding
+
+        return await self.query_flight.do((model_name, query), lambda: self._embed_query(model_name, query))
+
+    async def _embed_query(self, model_name: str, query: str):
+        embedding = await self.generate_embedding(query)
+        if embedding is not None:
+            self.query_cache.put(model_name, query, embedding)
+
+        return embedding
+
+    async def close(self):
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+            self._retry_handle = None
+
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+
+        try:
+            self.query_cache.save()
+        except Exception as e:
+            print(f"Erro ao salvar cache de consultas: {e}")
+
+        await self.factory.close()
+
+    def _load_knowledge(self) -> tuple:
+        """Lê a base inteira como entradas (sem o texto completo) e monta o índice lexical sobre todas elas"""
+        knowledge = []
+        for idx, item in enumerate(iter_knowledge_items(self.knowledge_base_path)):
+            text_to_embed = self._build_text_to_embed(item)
+            knowledge.append({
+                'id': item.get('id', idx),
+                'hash': self._hash_text(text_to_embed),
+                'original_data': item,
+                'text_embedded': text_to_embed[:200]
+            })
+
+        lexical_index = LexicalIndex()
+        lexical_index.build([entry['original_data'] for entry in knowledge])
+        return knowledge, lexical_index
+
+    def _build_index(self, vectors) -> SimilarityIndex:
+        index = self._new_similarity_index()
+        index.build(vectors, normalized=True)
+        return index
+
+    async def _set_embeddings(self, knowledge: list, lexical_index: LexicalIndex, items: list, vectors, dense_rows: list):
+        """Monta o índice denso fora do event loop e troca tudo de uma vez; buscas em andamento usam os anteriores.
+        dense_rows[i] é a linha em `knowledge` do i-ésimo vetor
+        """
+        self.warmup['stage'] = 'building_index'
+        index = await asyncio.to_thread(self._build_index, vectors)
+        self.knowledge, self.lexical_index = knowledge, lexical_index
+        self.cache, self.index, self.dense_rows = items, index, np.asarray(dense_rows, dtype=np.int64)
+
+    def _is_symbol_query(self, lexical_index: LexicalIndex, query: str) -> bool:
+        rows, _ = lexical_index.search(query, 1)
+        return len(rows) > 0 and lexical_index.is_symbol_query(query)
+
+    async def search_relevant_knowledge(self, query: str, top_k: int = 5):
+        if self.retrieval_mode == "dense":
+            if not self.ready and not await self.wait_ready():
+                print("Falha ao inicializar cache de embeddings.")
+                return []
+        elif not await self.wait_knowledge():
+            print("Falha ao carregar a base de conhecimento.")
+            return []
+        elif self.retrieval_mode == "hybrid" and not self.ready and not self._is_symbol_query(self.lexical_index, query):
+            # Só consultas em linguagem natural esperam o primeiro aquecimento do índice denso;
+            # se ele falhou, a ranking lexical volta na hora
+            await self.wait_ready()
+
+        # Os índices podem ser trocados por um novo aquecimento durante os awaits abaixo
+        knowledge, lexical_index = self.knowledge, self.lexical_index
+        index, dense_rows = self.index, self.dense_rows
+
+        candidates = max(top_k * 4, 20)
+        rankings = []
+
+        symbol_query = False
+        if self.retrieval_mode != "dense":
+            rows, _ = lexical_index.search(query, candidates)
+            rankings.append(('lexical', rows))
+            symbol_query = len(rows) > 0 and lexical_index.is_symbol_query(query)
+
+        # Consultas só com identificadores conhecidos não esperam pelo serviço de embedding
+        use_dense = self.retrieval_mode == "dense" or (self.retrieval_mode == "hybrid" and not symbol_query)
+
+        dense_scores = {}
+        if use_dense and len(dense_rows):
+            rows, scores = await self._dense_search(index, query, candidates)
+            rows = dense_rows[rows]
+            dense_scores = {int(row): float(score) for row, score in zip(rows, scores)}
+            rankings.append(('dense', rows))
+
+        return self._fuse_rankings(knowledge, rankings, dense_scores, top_k)
+
+    async def _dense_search(self, index: SimilarityIndex, query: str, top_k: int):
+        query_embedding = await self.get_query_embedding(query)
+
+        if query_embedding is None:
+            print("Falha ao gerar embedding para a consulta.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        try:
+            return index.search(query_embedding, top_k)
+        except ValueError as e:
+            print(f"Erro ao calcular similaridade: {e}")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    def _fuse_rankings(self, knowledge: list, rankings: list, dense_scores: dict, top_k: int) -> list:
+        """Reciprocal rank fusion: score = Σ 1 / (k + posição) nas listas em que o item aparece.
+
+        'similarity' é o score fundido dividido pelo máximo possível (1.0 = primeiro em todas as listas
+        não vazias; uma ranking vazia, como a densa com o embedding fora do ar, não conta).
+        """
+        fused = {}
+        sources = {}
+        for source, rows in rankings:
+            for rank, row in enumerate(rows):
+                row = int(row)
+                fused[row] = fused.get(row, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                sources.setdefault(row, []).append(source)
+
+        non_empty = sum(1 for _, rows in rankings if len(rows))
+        max_score = non_empty / (self.rrf_k + 1) if non_empty else 1.0
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+        return [
             {
-                "file": "/opt/stack/nova/nova/virt/libvirt/guest.py",
-                "functions": ["launch", "shutdown", "pause", "resume", "create_snapshot", "attach_device", "detach_device", "get_xml_desc"],
-                "description": "LibVirt Guest - Abstração de domínio LibVirt. Gerencia operações diretas na VM guest.",
-                "fault_scenarios": "guest não responde, operação timeout, device attach falhou, snapshot falhou, estado inconsistente"
+                'id': knowledge[row]['id'],
+                'data': knowledge[row]['original_data'],
+                'text_preview': knowledge[row]['text_embedded'],
+                'similarity': fused[row] / max_score,
+                'dense_similarity': dense_scores.get(row),
+                'match': sources[row][0] if len(sources[row]) == 1 else 'hybrid'
             }
+            for row in best
+        ]
+
+    def _build_text_to_embed(self, item: dict) -> str:
+        text_to_embed = ""
+
+        if 'file' in item:
+            text_to_embed += f"File: {item['file']} "
+        if 'functions' in item:
+            text_to_embed += f"Functions: {' '.join(item['functions'])} "
+        if 'description' in item:
+            text_to_embed += f"Description: {item['description']} "
+        if 'fault_scenarios' in item:
+            text_to_embed += f"Scenarios: {item['fault_scenarios']} "
+
+        return text_to_embed
+
+    def _hash_text(self, text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _load_store(self):
+        """Retorna (itens, vetores) do store em disco, ou None se ausente ou incompatível"""
+        embed_model = self.factory.get_embedding_model()
+
+        if not self.store.exists():
+            return None
+
+        try:
+            return self.store.load(embed_model.name, embed_model.dimension)
+        except ValueError as e:
+            print(f"Store de embeddings rejeitado: {e}")
+            return None
+
+    def _load_legacy_json(self, legacy_file: str):
+        """Lê o antigo openstack_knowledge_embeddings.json como (itens, vetores), para reaproveitar os embeddings"""
+        if not os.path.exists(legacy_file):
+            return None
+
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            legacy_cache = [item for item in json.load(f) if item.get('embedding')]
+
+        embed_model = self.factory.get_embedding_model()
+        if any(len(item['embedding']) != embed_model.dimension for item in legacy_cache):
+            print("Cache JSON legado com dimensão incompatível, ignorando.")
+            return None
+
+        items = [
+            {'id': item['id'], 'hash': self._hash_text(self._build_text_to_embed(item['original_data']))}
+            for item in legacy_cache
         ]
+        vectors = np.array([item['embedding'] for item in legacy_cache], dtype=np.float32)
+        vectors = SimilarityIndex.normalize(vectors.reshape(len(items), embed_model.dimension))
+
+        return items, vectors
+
+    async def _embed_pending(self, pending: list) -> dict:
+        """Embeda os textos pendentes em lotes concorrentes; retorna {hash: embedding} dos que deram certo"""
+        batch_size = self.factory.get_embedding_model().batch_size
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+        async def embed_batch(batch):
+            embeddings = await self.generate_embeddings([text for _, text in batch])
+            return [(text_hash, embedding) for (text_hash, _), embedding in zip(batch, embeddings)]
+
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches), return_exceptions=True)
+
+        embedded = {}
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Erro processando lote de embeddings: {result}")
+                continue
+            for text_hash, embedding in result:
+                if embedding is not None:
+                    embedded[text_hash] = embedding
 
-    def generate_embedding(self, text: str, max_retries: int = 3):
-        payload = {
-            "inputs": text[:512],
-            "options": {
-                "wait_for_model": True,
-                "use_cache": True
+        return embedded
+
+    def _iter_entry_chunks(self, knowledge: list):
+        """(linha inicial, bloco) das entradas da base em blocos de ingest_chunk_size"""
+        for offset in range(0, len(knowledge), self.ingest_chunk_size):
+            yield offset, knowledge[offset:offset + self.ingest_chunk_size]
+
+    async def initialize_embeddings(self):
+        """Sincroniza o store com a base de conhecimento em KNOWLEDGE_BASE_PATH.
+
+        A base é lida uma vez e o índice lexical (sobre todos os itens) fica disponível antes dos
+        embeddings. Depois ela é embedada em blocos, então só um bloco de textos fica em memória por vez.
+        Cada item é identificado pelo hash do texto embedado: só itens novos ou alterados
+        são embedados de novo, e itens removidos da base saem do store.
+        """
+        embed_model = self.factory.get_embedding_model()
+
+        self.warmup['stage'] = 'indexing_text'
+        knowledge, lexical_index = await asyncio.to_thread(self._load_knowledge)
+        if not self.ready:
+            # Sem índice denso carregado, a busca lexical já pode usar a base nova
+            self.knowledge, self.lexical_index = knowledge, lexical_index
+        self._knowledge_loaded.set()
+
+        self.warmup['stage'] = 'loading_store'
+        stored = await asyncio.to_thread(self._load_store)
+        from_store = stored is not None
+        if stored is None:
+            stored = await asyncio.to_thread(self._load_legacy_json, LEGACY_EMBEDDINGS_FILE) or ([], np.empty((0, embed_model.dimension), dtype=np.float32))
+        stored_items, stored_vectors = stored
+        known_rows = {item['hash']: row for row, item in enumerate(stored_items) if 'hash' in item}
+
+        items = []
+        dense_rows = []
+        vector_chunks = []
+        reembedded = 0
+        # Enquanto a base bate com o store, linha a linha, nada é copiado da matriz mapeada
+        unchanged = from_store
+
+        self.warmup['stage'] = 'ingesting'
+        for offset, chunk in self._iter_entry_chunks(knowledge):
+            self.warmup['items_processed'] += len(chunk)
+            await asyncio.sleep(0)
+
+            if unchanged:
+                stored_hashes = [item.get('hash') for item in stored_items[len(items):len(items) + len(chunk)]]
+                if stored_hashes == [entry['hash'] for entry in chunk]:
+                    items += chunk
+                    dense_rows += range(offset, offset + len(chunk))
+                    continue
+
+                unchanged = False
+                vector_chunks.append(np.asarray(stored_vectors[:len(items)], dtype=np.float32))
+
+            pending = {
+                entry['hash']: self._build_text_to_embed(entry['original_data'])
+                for entry in chunk if entry['hash'] not in known_rows
             }
-        }
-        
-        for attempt in range(max_retries):
-            try:
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.factory.get_embedding_model()['token']}"
+            embedded = {}
+            if pending:
+                print(f"Gerando embeddings para {len(pending)} itens novos ou alterados...")
+                embedded = {
+                    text_hash: SimilarityIndex.normalize(embedding)
+                    for text_hash, embedding in (await self._embed_pending(list(pending.items()))).items()
+                    if len(embedding) == embed_model.dimension
                 }
-                
-                response = requests.post(
-                    self.factory.get_embedding_model()["url"],
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    embedding = response.json()
-                    if isinstance(embedding, list) and len(embedding) > 0:
-                        if isinstance(embedding[0], list):
-                            return np.mean(embedding, axis=0).tolist()
-                        return embedding
-                
-                elif response.status_code == 503:
-                    print(f"Modelo carregando... tentativa {attempt + 1}")
-                    time.sleep(20)
-                
-                elif response.status_code == 401:
-                    print(f"Erro 401 - API requer autenticação. Configure HUGGINGFACE_TOKEN")
-                    return None
-                
-                else:
-                    print(f"Erro API: {response.status_code}")
-                    time.sleep(5)
-                    
-            except Exception as e:
-                print(f"Erro na tentativa {attempt + 1}: {e}")
-                time.sleep(10)
-    
-    def cosine_similarity(self, a, b) -> float:
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-    def search_relevant_knowledge(self, query: str, top_k: int = 5):
-        if self.cache is None or len(self.cache) == 0:
-            print("Cache de em'beddings não disponível. Tentando inicializar...")
-            self.initialize_embeddings()
-        
-            if self.cache is None or len(self.cache) == 0:
-                print("Falha ao inicializar cache de embeddings.")
-                return []
+                reembedded += len(pending)
+                self.warmup['items_embedded'] = reembedded
 
-        query_embedding = self.generate_embedding(query)
-        
-        if query_embedding is None:
-            print("Falha ao gerar embedding para a consulta.")
-            return []
-        
-        similarities = []
-        
-        for item in self.cache:
-            if item.get("embedding"):
-                try:
-                    sim = self.cosine_similarity(query_embedding, item['embedding'])
-                    
-                    similarities.append({
-                        'id': item['id'],
-                        'data': item['original_data'],
-                        'text_preview': item['text_embedded'],
-                        'similarity': float(sim)
-                    })
-                
-                except Exception as e:
-                    print(f"Erro ao calcular similaridade para item {item['id']}: {e}")
+            vectors = np.empty((len(chunk), embed_model.dimension), dtype=np.float32)
+            count = 0
+            for row, entry in enumerate(chunk, offset):
+                if entry['hash'] in known_rows:
+                    vectors[count] = stored_vectors[known_rows[entry['hash']]]
+                elif entry['hash'] in embedded:
+                    vectors[count] = embedded[entry['hash']]
+                else:
+                    print(f"Item {entry['id']} sem embedding (só na busca lexical), será tentado novamente na próxima inicialização.")
                     continue
-        
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        return similarities[:top_k]
-    
-    def initialize_embeddings(self):
-        
-        embeddings_file = 'openstack_knowledge_embeddings.json'
-
-        if os.path.exists(embeddings_file):
-            with open(embeddings_file, 'r', encoding='utf-8') as f:
-                self.cache = json.load(f)
-                print(f"Cache de embeddings carregado com {len(self.cache)} itens.")
-                return
-        
-        knowledge_embeddings = []
-        
-        for idx, item in enumerate(self.OPENSTACK_KNOWLEDGE_BASE):
-            try:
-                text_to_embed = ""
-                
-                if 'file' in item:
-                    text_to_embed += f"File: {item['file']} "
-                if 'functions' in item:
-                    text_to_embed += f"Functions: {' '.join(item['functions'])} "
-                if 'description' in item:
-                    text_to_embed += f"Description: {item['description']} "
-                if 'fault_scenarios' in item:
-                    text_to_embed += f"Scenarios: {item['fault_scenarios']} "
-
-                embedding = self.generate_embedding(text_to_embed)
 
-                if embedding is not None:
-                    knowledge_embeddings.append({
-                        'id': idx,
-                        'original_data': item,
-                        'text_embedded': text_to_embed[:200],
-                        'embedding': embedding
-                    })
-
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"Erro processando item {idx}: {e}")
-                raise e
-        
-        with open(embeddings_file, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_embeddings, f, indent=2, ensure_ascii=False)
-
-        self.cache = knowledge_embeddings
-        print(f"Cache de embeddings inicializado com {len(self.cache)} itens.")
\ No newline at end of file
+                count += 1
+                items.append(entry)
+                dense_rows.append(row)
+
+            vector_chunks.append(vectors[:count])
+
+        # Base inalterada: usa a matriz mapeada do disco diretamente, sem cópia
+        if unchanged and len(items) == len(stored_items):
+            await self._set_embeddings(knowledge, lexical_index, items, stored_vectors, dense_rows)
+            print(f"Cache de embeddings carregado com {len(self.cache)} itens.")
+            return
+
+        if unchanged:
+            vector_chunks.append(np.asarray(stored_vectors[:len(items)], dtype=np.float32))
+
+        vectors = np.concatenate(vector_chunks) if vector_chunks else np.empty((0, embed_model.dimension), dtype=np.float32)
+        # Nenhum embedding (serviço fora do ar) não sobrescreve o store com uma base vazia
+        if items or not knowledge:
+            self.warmup['stage'] = 'saving_store'
+            await asyncio.to_thread(self.store.save, items, vectors, embed_model.name)
+
+        await self._set_embeddings(knowledge, lexical_index, items, vectors, dense_rows)
+        print(f"Cache de embeddings inicializado com {len(self.cache)} itens ({reembedded} reembedados).")
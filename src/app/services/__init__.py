@@ -1,5 +1,12 @@
+from src.app.data import VectorRepository
 from .agent_service import AgentService
+from .job_service import JobService
+from .campaign_service import CampaignService
 
-agent_service_instance = AgentService()
+# Um único repositório por processo, compartilhado pelo pipeline e pelo aquecimento no startup
+repository_instance = VectorRepository()
+agent_service_instance = AgentService(repository_instance)
+job_service_instance = JobService(agent_service_instance)
+campaign_service_instance = CampaignService(agent_service_instance)
 
-__all__ = ["agent_service_instance"]
\ No newline at end of file
+__all__ = ["agent_service_instance", "job_service_instance", "campaign_service_instance", "repository_instance"]
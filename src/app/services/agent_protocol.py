@@ -0,0 +1,98 @@
+import json
+import zlib
+
+FLAG_COMPRESSED = 0x01
+FLAG_MORE = 0x02
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+def available_codecs() -> list:
+    """Codecs que este servidor entende, do preferido ao fallback (msgpack só se o pacote estiver instalado)"""
+    return ['msgpack', 'json'] if _msgpack() is not None else ['json']
+
+class AgentCodec:
+    """Formato das mensagens trocadas com um agente, negociado no registro.
+
+    json sem compressão usa frames de texto, como o protocolo original. As demais combinações usam
+    frames binários [flags: 1 byte][tamanho do command_id: 1 byte][command_id][payload], com o
+    payload em msgpack ou JSON UTF-8, comprimido com zlib quando flags & 0x01 e com flags & 0x02
+    nas partes intermediárias de uma resposta ("more"). O command_id no cabeçalho permite descartar
+    respostas atrasadas sem decodificar (nem descomprimir) o payload.
+    """
+
+    def __init__(self, codec: str = 'json', compression: str = None, threshold: int = 4096, level: int = 1):
+        self.codec = codec
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self._msgpack = _msgpack() if codec == 'msgpack' else None
+
+    @property
+    def binary(self) -> bool:
+        return self.codec != 'json' or self.compression is not None
+
+    def describe(self) -> dict:
+        return {'codec': self.codec, 'compression': self.compression, 'compression_threshold': self.threshold}
+
+    def _dumps(self, message: dict) -> bytes:
+        if self._msgpack is not None:
+            return self._msgpack.packb(message, use_bin_type=True)
+        return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+    def _loads(self, payload: bytes) -> dict:
+        if self._msgpack is not None:
+            return self._msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
+
+    def encode(self, message: dict):
+        """Frame de texto (str) ou binário (bytes) pronto para o WebSocket"""
+        if not self.binary:
+            return json.dumps(message)
+
+        payload = self._dumps(message)
+        flags = FLAG_MORE if message.get('more') else 0
+        if self.compression == 'zlib' and len(payload) >= self.threshold:
+            payload = zlib.compress(payload, self.level)
+            flags |= FLAG_COMPRESSED
+
+        command_id = str(message.get('command_id') or '').encode('utf-8')
+        return bytes((flags, len(command_id))) + command_id + payload
+
+    def header(self, frame) -> tuple:
+        """(command_id, more) de um frame binário lidos só do cabeçalho; (None, None) para frames de texto"""
+        if isinstance(frame, str):
+            return None, None
+        return frame[2:2 + frame[1]].decode('utf-8'), bool(frame[0] & FLAG_MORE)
+
+    def decode(self, frame) -> dict:
+        """Mensagem de um frame; frames de texto são sempre JSON (fallback de qualquer agente)"""
+        if isinstance(frame, str):
+            return json.loads(frame)
+
+        payload = frame[2 + frame[1]:]
+        if frame[0] & FLAG_COMPRESSED:
+            payload = zlib.decompress(payload)
+        return self._loads(payload)
+
+JSON_CODEC = AgentCodec()
+
+def negotiate(registration: dict, threshold: int = 4096) -> AgentCodec:
+    """Primeiro codec da lista do agente que o servidor suporta e zlib se o agente oferecer.
+
+    O agente declara {"protocol": {"codecs": ["msgpack", "json"], "compression": ["zlib"]}} no registro;
+    sem esse campo (agentes antigos) o resultado é JSON em frames de texto.
+    """
+    protocol = registration.get('protocol') or {}
+    supported = available_codecs()
+
+    codec = next((name for name in protocol.get('codecs') or [] if name in supported), 'json')
+    compression = 'zlib' if 'zlib' in (protocol.get('compression') or []) else None
+
+    if codec == 'json' and compression is None:
+        return JSON_CODEC
+    return AgentCodec(codec, compression, threshold)
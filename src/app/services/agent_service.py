@@ -1,23 +1,161 @@
 from fastapi import WebSocket, HTTPException
 from typing import Dict
+from collections import Counter, OrderedDict
 import json
 import uuid
 from datetime import datetime
 import asyncio
-from src.app.data import VectorRepository
-from src.core import Factory
+import os
+import time
+from src.app.data import AgentFileCache, LlmResponseCache, SymbolIndex, VectorRepository
+from src.app.services.agent_protocol import JSON_CODEC, AgentCodec, negotiate
+from src.app.data.symbol_index import function_names
+from src.app.services.code_slicer import function_ranges, map_line_number, number_lines, slice_lines
+from src.core import Factory, SingleFlight
+from src.core.telemetry import (
+    AGENT_COMMAND_DURATION,
+    LLM_REQUEST_DURATION,
+    LLM_TOKENS,
+    PIPELINE_STAGE_DURATION,
+    register_counter,
+    register_gauge,
+    timed_span
+)
+from contextlib import asynccontextmanager, contextmanager
 import re
+import zlib
+
+LLM_SYSTEM_PROMPT = "Você é um especialista em OpenStack. Analise e retorne APENAS o JSON solicitado."
+
+# Timeout (s) de resposta do agente por ação; "default" vale para as ações não listadas
+DEFAULT_COMMAND_TIMEOUTS = {
+    "default": 10.0,
+    "read_file": 10.0,
+    "modify_file": 10.0,
+    "modify_files": 30.0,
+    "read_full_file": 60.0,
+    # Leitura em partes: tempo máximo sem receber nenhuma parte, não da leitura inteira
+    "read_file_stream": 30.0,
+    "index_symbols": 120.0
+}
+
+# Rodadas de geração até completar os mutantes pedidos (respostas repetidas ou inválidas são descartadas)
+MUTANT_GENERATION_ROUNDS = 3
+
+DEFAULT_CAMPAIGN_QUERY = "Introduza falhas sutis que os testes deveriam detectar"
 
 class AgentService: 
-    def __init__(self):
+    def __init__(self, repository: VectorRepository = None):
         self.active_agents: Dict[str, WebSocket] = {}
         self.agent_info: Dict[str, dict] = {}
-        self.pending_responses: Dict[str, asyncio.Future] = {}
+        self.pending_responses: Dict[str, Dict[str, asyncio.Future]] = {}
+        self.partial_responses: Dict[str, list] = {}
+        self.agent_slots: Dict[str, asyncio.Semaphore] = {}
+        self.agent_codecs: Dict[str, AgentCodec] = {}
+        self.compression_threshold = int(os.environ.get("AGENT_COMPRESSION_THRESHOLD", "4096"))
+        self.message_bytes = Counter()
+        self.stream_queues: Dict[str, asyncio.Queue] = {}
+        self.stream_chunk_size = int(os.environ.get("STREAM_CHUNK_SIZE", str(256 * 1024)))
+        self.stream_window = int(os.environ.get("STREAM_WINDOW", "4"))
+        self.stream_max_bytes = int(os.environ.get("STREAM_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.max_inflight_per_agent = int(os.environ.get("AGENT_MAX_INFLIGHT", "8"))
+        self.queue_timeout = float(os.environ.get("AGENT_QUEUE_TIMEOUT", "30"))
+        self.command_timeouts = {
+            **DEFAULT_COMMAND_TIMEOUTS,
+            **json.loads(os.environ.get("AGENT_COMMAND_TIMEOUTS", "{}"))
+        }
         self.factory = Factory()
-        self.repository = VectorRepository()
+        self.registry = self.factory.get_agent_registry()
+        self.repository = repository or VectorRepository()
+        self._llm_semaphore = asyncio.Semaphore(self.factory.get_llm_config()["max_concurrency"])
+        self.file_cache = AgentFileCache(max_bytes=int(os.environ.get("FILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+        self.fanout_concurrency = int(os.environ.get("AGENT_FANOUT_CONCURRENCY", "16"))
+        self.mutation_context_lines = int(os.environ.get("MUTATION_CONTEXT_LINES", "5"))
+        # Intervalos recortados por (hash do arquivo, funções alvo): evita refazer o ast.parse a cada mutação
+        self._slice_ranges = OrderedDict()
+        self.slice_cache_size = int(os.environ.get("SLICE_CACHE_SIZE", "256"))
+        self.symbol_index = SymbolIndex()
+        # Etapas puras do pipeline: pedidos idênticos e simultâneos compartilham a mesma execução
+        self.knowledge_flight = SingleFlight()
+        self.llm_flight = SingleFlight()
+        self.file_read_flight = SingleFlight()
+        self._symbol_refreshes: Dict[str, asyncio.Task] = {}
+        # Quando o último refresh de cada agente falhou (time.monotonic())
+        self._symbol_refresh_failures: Dict[str, float] = {}
+        self.symbol_index_wait = float(os.environ.get("SYMBOL_INDEX_WAIT", "10"))
+        self.symbol_index_retry = float(os.environ.get("SYMBOL_INDEX_RETRY", "300"))
+        self.llm_cache = LlmResponseCache(
+            path=os.environ.get("LLM_CACHE_PATH", "llm_response_cache.sqlite3"),
+            max_entries=int(os.environ.get("LLM_CACHE_SIZE", "1000"))
+        )
+
+        register_gauge(
+            "cimut_agent_pending_commands",
+            "Comandos aguardando resposta, por agente",
+            lambda: [(len(pending), {'agent_id': agent_id}) for agent_id, pending in self.pending_responses.items()]
+        )
+        register_gauge(
+            "cimut_agents_connected",
+            "Agentes conectados a este worker",
+            lambda: [(len(self.active_agents), {})]
+        )
+        register_counter(
+            "cimut_agent_message_bytes",
+            "Bytes trocados com os agentes, por direção e codec",
+            lambda: [(count, {'direction': direction, 'codec': codec}) for (direction, codec), count in self.message_bytes.items()]
+        )
+        register_counter(
+            "cimut_singleflight_calls",
+            "Chamadas às etapas deduplicadas, por etapa e resultado (executed/shared)",
+            self._single_flight_observations
+        )
+        register_counter(
+            "cimut_cache_requests",
+            "Consultas aos caches, por cache e resultado (hit/miss)",
+            self._cache_observations
+        )
+
+    def _cache_observations(self) -> list:
+        caches = {
+            'query_embedding': self.repository.query_cache,
+            'llm_response': self.llm_cache,
+            'agent_file': self.file_cache
+        }
+        observations = []
+        for name, cache in caches.items():
+            observations.append((cache.hits, {'cache': name, 'result': 'hit'}))
+            observations.append((cache.misses, {'cache': name, 'result': 'miss'}))
+        return observations
+
+    def _single_flight_observations(self) -> list:
+        flights = {
+            'query_embedding': self.repository.query_flight,
+            'knowledge_search': self.knowledge_flight,
+            'llm_completion': self.llm_flight,
+            'file_read': self.file_read_flight
+        }
+        observations = []
+        for name, flight in flights.items():
+            observations.append((flight.executions, {'stage': name, 'result': 'executed'}))
+            observations.append((flight.shared, {'stage': name, 'result': 'shared'}))
+        return observations
+
+    async def start(self):
+        await self.registry.start(self._send_local)
+
+    async def close(self):
+        await self.repository.close()
+        await self.factory.close()
+        self.llm_cache.close()
     
     async def register_agent(self, agent_id: str, websocket: WebSocket, info: dict):
+        if agent_id in self.active_agents:
+            self._fail_pending(agent_id, "Agent reconnected")
+
         self.active_agents[agent_id] = websocket
+        self.pending_responses[agent_id] = {}
+        self.agent_slots[agent_id] = asyncio.Semaphore(self.max_inflight_per_agent)
+        self.agent_codecs[agent_id] = negotiate(info, self.compression_threshold)
 
         if agent_id in self.agent_info:
             self.agent_info[agent_id].update({
@@ -32,66 +170,404 @@ class AgentService:
                 'status': 'online'
             }
 
-    async def unregister_agent(self, agent_id: str):
+        await self.registry.register(agent_id, self.agent_info[agent_id])
+
+        # A confirmação (com o protocolo negociado) sai antes de qualquer comando no novo formato
+        await websocket.send_text(json.dumps({
+            'status': 'registered',
+            'agent_id': agent_id,
+            'protocol': self.agent_codecs[agent_id].describe()
+        }))
+
+        # Índice de símbolos em segundo plano: incremental se o agente já foi indexado antes
+        if 'index_symbols' in (self.agent_info[agent_id].get('capabilities') or []):
+            self._symbol_refresh_failures.pop(agent_id, None)
+            self._start_symbol_refresh(agent_id)
+
+    async def unregister_agent(self, agent_id: str, websocket: WebSocket = None):
+        # Uma conexão antiga encerrando depois de uma reconexão não derruba a nova
+        if websocket is not None and self.active_agents.get(agent_id) is not websocket:
+            return
+
         if agent_id in self.active_agents:
             del self.active_agents[agent_id]
         if agent_id in self.agent_info:
             self.agent_info[agent_id]['status'] = 'offline'
+            await self.registry.unregister(agent_id, self.agent_info[agent_id])
 
-        for command_id in list(self.pending_responses.keys()):
-            if command_id.startswith(agent_id):
-                future = self.pending_responses.pop(command_id, None)
-                if future and not future.done():
-                    future.cancel()
+        self._fail_pending(agent_id, "Agent disconnected")
+        self.pending_responses.pop(agent_id, None)
+        self.agent_slots.pop(agent_id, None)
+        self.agent_codecs.pop(agent_id, None)
+
+    def _fail_pending(self, agent_id: str, reason: str):
+        pending = self.pending_responses.get(agent_id, {})
+
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(reason))
+        pending.clear()
+
+    def pending_count(self, agent_id: str = None) -> int:
+        if agent_id is not None:
+            return len(self.pending_responses.get(agent_id, {}))
+        return sum(len(pending) for pending in self.pending_responses.values())
+
+    def get_command_timeout(self, action: str) -> float:
+        return self.command_timeouts.get(action, self.command_timeouts["default"])
     
-    async def handle_message(self, agent_id: str, message: str):
+    async def handle_message(self, agent_id: str, message):
+        """Resposta do agente em frame de texto (JSON) ou binário (codec negociado no registro)"""
+        pending = self.pending_responses.get(agent_id)
+        # Nada aguardando resposta: descarta sem decodificar
+        if not pending:
+            return
+
+        codec = self.agent_codecs.get(agent_id, JSON_CODEC)
+        self.message_bytes['received', codec.codec if isinstance(message, bytes) else 'json'] += len(message)
         try:
-            data = json.loads(message)
+            # Frames binários trazem o command_id no cabeçalho: respostas atrasadas nem são decodificadas
+            header_command_id, more = codec.header(message)
+            if header_command_id is not None and header_command_id not in pending:
+                return
+
+            data = codec.decode(message)
             command_id = data.get('command_id')
-            
-            if command_id and command_id in self.pending_responses:
-                future = self.pending_responses.pop(command_id)
+            if more is None:
+                more = bool(data.get('more'))
+
+            if command_id and command_id in pending:
+                # Respostas em partes: as mensagens com "more" vão para o consumidor do stream, se houver;
+                # senão acumulam até a final, que leva todas em "chunks"
+                if more:
+                    queue = self.stream_queues.get(command_id)
+                    if queue is not None:
+                        queue.put_nowait(data)
+                    else:
+                        self.partial_responses.setdefault(command_id, []).append(data.get('data'))
+                    return
+
+                future = pending.pop(command_id)
+                chunks = self.partial_responses.pop(command_id, None)
+                if chunks is not None:
+                    data['chunks'] = chunks
                 if not future.done():
                     future.set_result(data)
     
-        except json.JSONDecodeError:
+        except (ValueError, IndexError, UnicodeDecodeError, zlib.error, AttributeError):
             pass 
     
-    async def send_command(self, agent_id: str, command: dict) -> dict:
-        if agent_id not in self.active_agents:
+    def _invalidate_modified_files(self, agent_id: str, command: dict):
+        if command.get('action') == 'modify_file':
+            file_paths = [command.get('file_path')]
+        elif command.get('action') == 'modify_files':
+            file_paths = [mod.get('file_path') for mod in command.get('modifications', [])]
+        else:
+            return
+
+        for file_path in file_paths:
+            self.file_cache.invalidate(agent_id, file_path)
+            # Leituras que virem depois da modificação não reaproveitam uma leitura iniciada antes dela
+            self.file_read_flight.forget((agent_id, file_path))
+            self.symbol_index.mark_stale(agent_id, file_path)
+
+    async def list_agents(self) -> dict:
+        return await self.registry.list_agents()
+
+    async def get_agent_info(self, agent_id: str) -> dict:
+        if agent_id in self.active_agents:
+            return self.agent_info[agent_id]
+        return await self.registry.get_agent(agent_id) or {}
+
+    async def send_command(self, agent_id: str, command: dict, timeout: float = None) -> dict:
+        """Envia o comando ao agente, direto pelo WebSocket local ou pelo worker que o mantém"""
+        if agent_id in self.active_agents:
+            return await self._send_local(agent_id, command, timeout)
+
+        owner = await self.registry.get_owner(agent_id)
+        if owner is None or owner == self.registry.worker_id:
+            raise HTTPException(status_code=404, detail="Agent not found or offline")
+
+        action_timeout = timeout or self.get_command_timeout(command.get('action'))
+
+        try:
+            reply = await self.registry.forward(
+                owner, agent_id, command, action_timeout,
+                wait_timeout=action_timeout + max(self.queue_timeout, 0) + 5
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=408, detail="Agent response timeout")
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        if not reply.get('ok'):
+            raise HTTPException(status_code=reply.get('status_code', 500), detail=reply.get('detail'))
+
+        return reply['response']
+
+    async def _send_local(self, agent_id: str, command: dict, timeout: float = None) -> dict:
+        """Envia o comando pelo WebSocket mantido por este worker e aguarda a resposta do agente.
+
+        Cada agente aceita até AGENT_MAX_INFLIGHT comandos em voo; os excedentes esperam
+        na fila por até AGENT_QUEUE_TIMEOUT segundos (0 = rejeita na hora) e depois recebem 429.
+        """
+        async with self._agent_slot(agent_id):
+            attributes = {'agent_id': agent_id, 'action': command.get('action', 'unknown')}
+            with timed_span("agent.command", AGENT_COMMAND_DURATION, attributes):
+                return await self._send_and_wait(agent_id, command, timeout)
+
+    @asynccontextmanager
+    async def _agent_slot(self, agent_id: str):
+        slots = self.agent_slots.get(agent_id)
+        if agent_id not in self.active_agents or slots is None:
+            raise HTTPException(status_code=404, detail="Agent not found or offline")
+
+        try:
+            if self.queue_timeout <= 0:
+                if slots.locked():
+                    raise asyncio.TimeoutError()
+                await slots.acquire()
+            else:
+                await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=429, detail="Agent busy: too many commands in flight")
+
+        try:
+            yield
+        finally:
+            slots.release()
+
+    async def _send_frame(self, agent_id: str, websocket, message: dict):
+        codec = self.agent_codecs.get(agent_id, JSON_CODEC)
+        frame = codec.encode(message)
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+        self.message_bytes['sent', codec.codec if isinstance(frame, bytes) else 'json'] += len(frame)
+
+    async def _send_and_wait(self, agent_id: str, command: dict, timeout: float = None) -> dict:
+        websocket = self.active_agents.get(agent_id)
+        pending = self.pending_responses.get(agent_id)
+        if websocket is None or pending is None:
             raise HTTPException(status_code=404, detail="Agent not found or offline")
         
-        websocket = self.active_agents[agent_id]
+        self._invalidate_modified_files(agent_id, command)
+
         command_id = str(uuid.uuid4())
         command['command_id'] = command_id
 
-        future = asyncio.Future()
-        self.pending_responses[command_id] = future
+        future = asyncio.get_running_loop().create_future()
+        pending[command_id] = future
 
         try:
-            await websocket.send_text(json.dumps(command))
+            await self._send_frame(agent_id, websocket, command)
             
-            response = await asyncio.wait_for(future, timeout=10)
+            response = await asyncio.wait_for(future, timeout=timeout or self.get_command_timeout(command.get('action')))
             return response
             
         except asyncio.TimeoutError:
-            self.pending_responses.pop(command_id, None)
             raise HTTPException(status_code=408, detail="Agent response timeout")
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         except Exception as e:
-            self.pending_responses.pop(command_id, None)
             raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            pending.pop(command_id, None)
+            self.partial_responses.pop(command_id, None)
+
+    async def stream_command(self, agent_id: str, command: dict, on_chunk, idle_timeout: float = None) -> dict:
+        """Envia um comando cuja resposta chega em partes numeradas ("seq") e entrega o `data` de cada
+        parte a on_chunk assim que ela chega; retorna a mensagem final. Só para agentes deste worker.
+
+        Controle de fluxo: cada parte consumida é confirmada com {"action": "stream_ack", "stream_id", "seq"}
+        e o agente mantém no máximo `window` partes sem confirmação. O timeout vale entre partes, não para
+        a resposta inteira. Se on_chunk falhar (ex.: limite de tamanho), o agente recebe "cancel_stream".
+        """
+        async with self._agent_slot(agent_id):
+            attributes = {'agent_id': agent_id, 'action': command.get('action', 'unknown')}
+            with timed_span("agent.command", AGENT_COMMAND_DURATION, attributes):
+                return await self._stream_and_wait(agent_id, command, on_chunk, idle_timeout)
+
+    async def _stream_and_wait(self, agent_id: str, command: dict, on_chunk, idle_timeout: float = None) -> dict:
+        websocket = self.active_agents.get(agent_id)
+        pending = self.pending_responses.get(agent_id)
+        if websocket is None or pending is None:
+            raise HTTPException(status_code=404, detail="Agent not found or offline")
+
+        command_id = str(uuid.uuid4())
+        command['command_id'] = command_id
+        command['window'] = self.stream_window
+        idle_timeout = idle_timeout or self.get_command_timeout(command.get('action'))
+
+        future = asyncio.get_running_loop().create_future()
+        queue = asyncio.Queue()
+        pending[command_id] = future
+        self.stream_queues[command_id] = queue
+        finished = False
+
+        try:
+            await self._send_frame(agent_id, websocket, command)
+
+            seq = 0
+            while True:
+                if queue.empty():
+                    # A final só é resolvida depois de todas as partes entrarem na fila
+                    if future.done():
+                        break
+
+                    getter = asyncio.ensure_future(queue.get())
+                    try:
+                        done, _ = await asyncio.wait({getter, future}, timeout=idle_timeout, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        if not getter.done():
+                            getter.cancel()
+
+                    if not done:
+                        raise asyncio.TimeoutError()
+                    if getter not in done:
+                        continue
+                    message = getter.result()
+                else:
+                    message = queue.get_nowait()
+
+                if message.get('seq', seq) != seq:
+                    raise ValueError(f"Parte {message.get('seq')} fora de ordem (esperada {seq})")
+
+                on_chunk(message.get('data') or {})
+                await self._send_frame(agent_id, websocket, {'action': 'stream_ack', 'stream_id': command_id, 'seq': seq})
+                seq += 1
+
+            response = future.result()
+            if response.get('seq', seq) != seq:
+                raise ValueError(f"Resposta final com seq {response.get('seq')}, mas {seq} partes recebidas")
+
+            on_chunk(response.get('data') or {})
+            finished = True
+            return response
+
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=408, detail="Agent stream timeout: no chunk received in time")
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        finally:
+            pending.pop(command_id, None)
+            self.stream_queues.pop(command_id, None)
+            if not finished and agent_id in self.active_agents:
+                try:
+                    await self._send_frame(agent_id, websocket, {'action': 'cancel_stream', 'stream_id': command_id})
+                except Exception:
+                    pass
         
-    async def llm_injection_fault(self, agent_id: str, user_query: str):
+    async def select_agents(self, agent_ids: list = None, filters: dict = None) -> list:
+        """Agentes entre agent_ids (ou todos os online) cujo registro casa com os filtros.
+
+        Um filtro com lista de valores aceita qualquer um deles.
+        """
+        agents = await self.registry.list_agents()
+        if agent_ids is not None:
+            candidates = agent_ids
+        else:
+            candidates = [agent_id for agent_id, info in agents.items() if info.get('status') == 'online']
+        selected = []
+
+        for agent_id in candidates:
+            info = agents.get(agent_id, {})
+            if filters and not all(
+                info.get(key) in value if isinstance(value, list) else info.get(key) == value
+                for key, value in filters.items()
+            ):
+                continue
+            selected.append(agent_id)
+
+        return selected
+
+    async def broadcast_command(self, command: dict, agent_ids: list = None, filters: dict = None, max_concurrency: int = None) -> dict:
+        """Envia o mesmo comando a vários agentes em paralelo; retorna status e latência por agente"""
+        targets = await self.select_agents(agent_ids, filters)
+        semaphore = asyncio.Semaphore(max_concurrency or self.fanout_concurrency)
+
+        async def send_to(agent_id: str) -> dict:
+            async with semaphore:
+                started_at = time.perf_counter()
+                try:
+                    response = await self.send_command(agent_id, dict(command))
+                    result = {'status': 'success', 'response': response}
+                except HTTPException as e:
+                    status = 'timeout' if e.status_code == 408 else 'error'
+                    result = {'status': status, 'error': e.detail}
+                except Exception as e:
+                    result = {'status': 'error', 'error': str(e)}
+
+                result['latency_ms'] = round((time.perf_counter() - started_at) * 1000, 2)
+                return result
+
+        results = await asyncio.gather(*(send_to(agent_id) for agent_id in targets))
+
+        summary = {'success': 0, 'error': 0, 'timeout': 0}
+        for result in results:
+            summary[result['status']] += 1
+
+        return {
+            'results': dict(zip(targets, results)),
+            'total': len(targets),
+            'summary': summary
+        }
+
+    async def agent_supports(self, agent_id: str, action: str) -> bool:
+        capabilities = (await self.get_agent_info(agent_id)).get('capabilities') or []
+        return action in capabilities
+
+    async def apply_modifications(self, agent_id: str, modifications: list) -> list:
+        """Aplica edições {file_path, line_number, new_content} e retorna o resultado de cada uma, na mesma ordem.
+
+        Agentes que anunciam 'modify_files' recebem todas as edições em um único comando;
+        os demais recebem um 'modify_file' por edição.
+        """
+        if await self.agent_supports(agent_id, 'modify_files'):
+            command = {
+                'action': 'modify_files',
+                'modifications': modifications
+            }
+
+            response = await self.send_command(agent_id, command)
+            return response['data']
+
+        results = []
+        for mod in modifications:
+            command = {
+                'action': 'modify_file',
+                **mod
+            }
+
+            response = await self.send_command(agent_id, command)
+            results.append(response['data'])
+
+        return results
+
+    @contextmanager
+    def _pipeline_stage(self, name: str, on_stage=None):
+        if on_stage is not None:
+            on_stage(name)
+
+        with timed_span(f"find_fault_target.{name}", PIPELINE_STAGE_DURATION, {'stage': name}) as span:
+            yield span
+
+    async def llm_injection_fault(self, agent_id: str, user_query: str, use_cache: bool = True, on_stage=None):
+        """Executa o pipeline completo; on_stage(etapa), se informado, é chamado no início de cada etapa"""
         try:
-            relevant_knowledge = await self._search_relevant_knowledge(user_query)
-            
-            target_info = await self._analyze_target_location(user_query, relevant_knowledge)
+            target_info = await self._find_target(agent_id, user_query, use_cache, on_stage)
 
-            file_content = await self._read_target_file(agent_id, target_info)
+            with self._pipeline_stage('reading_file', on_stage):
+                file_content = await self._read_target_file(agent_id, target_info)
 
-            mutation_info = await self._generate_mutation(target_info, file_content, user_query)
+            with self._pipeline_stage('generating_mutation', on_stage):
+                mutation_info = await self._generate_mutation(target_info, file_content, user_query, use_cache)
 
-            modification_results = await self._apply_mutations(agent_id, target_info, mutation_info)
+            with self._pipeline_stage('applying_mutations', on_stage):
+                modification_results = await self._apply_mutations(agent_id, target_info, mutation_info)
 
             return {
                 'target_file': target_info['target_file'],
@@ -103,37 +579,237 @@ class AgentService:
             
         except Exception as e:
             return {"error": f"Erro durante injeção de falhas: {str(e)}"}
+
+    async def _find_target(self, agent_id: str, user_query: str, use_cache: bool = True, on_stage=None) -> dict:
+        with self._pipeline_stage('searching_knowledge', on_stage):
+            relevant_knowledge = await self._search_relevant_knowledge(user_query)
+
+        with self._pipeline_stage('resolving_symbols', on_stage):
+            relevant_knowledge = await self._filter_knowledge_by_symbols(agent_id, relevant_knowledge)
+
+        with self._pipeline_stage('analyzing_target', on_stage):
+            target_info = await self._analyze_target_location(user_query, relevant_knowledge, use_cache)
+            return self._resolve_target(agent_id, target_info, relevant_knowledge)
+
+    async def plan_mutants(self, agent_id: str, user_query: str = None, target: dict = None, count: int = 1,
+                           use_cache: bool = True, on_stage=None) -> dict:
+        """Etapas do pipeline até a geração, sem aplicar nada: até `count` mutantes distintos do alvo,
+        vindo da consulta ou informado em target={'file_path', 'function'}, lidos do checkout de agent_id
+        """
+        if target is not None:
+            target_info = {
+                'target_file': target['file_path'],
+                'target_function': target.get('function') or '',
+                'reasoning': "Alvo informado na requisição"
+            }
+            if target_info['target_function']:
+                with self._pipeline_stage('resolving_symbols', on_stage):
+                    if await self._ensure_symbol_index(agent_id):
+                        target_info = self._resolve_target(agent_id, target_info, [])
+        else:
+            target_info = await self._find_target(agent_id, user_query, use_cache, on_stage)
+
+        with self._pipeline_stage('reading_file', on_stage):
+            file_content = await self._read_target_file(agent_id, target_info)
+
+        with self._pipeline_stage('generating_mutation', on_stage):
+            mutants = await self._generate_mutants(
+                target_info, file_content, user_query or DEFAULT_CAMPAIGN_QUERY, count, use_cache
+            )
+
+        return {
+            'target_file': target_info['target_file'],
+            'target_function': target_info['target_function'],
+            'reasoning': target_info['reasoning'],
+            'file_content': file_content,
+            'mutants': mutants
+        }
         
     async def _search_relevant_knowledge(self, user_query: str):
-        relevant_knowledge = self.repository.search_relevant_knowledge(user_query, top_k=5)
+        relevant_knowledge = await self.knowledge_flight.do(
+            (user_query, 5),
+            lambda: self.repository.search_relevant_knowledge(user_query, top_k=5)
+        )
         
         if not relevant_knowledge:
             raise ValueError("Nenhum conhecimento relevante encontrado")
             
         return relevant_knowledge
     
-    async def _analyze_target_location(self, user_query: str, relevant_knowledge: list) -> dict:
+    def _start_symbol_refresh(self, agent_id: str) -> asyncio.Task:
+        """Um refresh por agente por vez; chamadas concorrentes reaproveitam a mesma tarefa"""
+        task = self._symbol_refreshes.get(agent_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.refresh_symbol_index(agent_id))
+            task.add_done_callback(lambda done: self._on_refresh_done(agent_id, done))
+            self._symbol_refreshes[agent_id] = task
+        return task
+
+    def _on_refresh_done(self, agent_id: str, task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            print(f"Erro indexando símbolos do agente {agent_id}: {task.exception()}")
+            self._symbol_refresh_failures[agent_id] = time.monotonic()
+        else:
+            self._symbol_refresh_failures.pop(agent_id, None)
+
+    async def refresh_symbol_index(self, agent_id: str) -> dict:
+        """Pede ao agente os símbolos dos arquivos novos/alterados desde o último índice e aplica a diferença"""
+        response = await self.send_command(agent_id, {
+            'action': 'index_symbols',
+            'known_files': self.symbol_index.known_hashes(agent_id)
+        })
+
+        changed = removed = 0
+        for part in (response.get('chunks') or []) + [response.get('data')]:
+            if not isinstance(part, dict):
+                continue
+            self.symbol_index.update(agent_id, part.get('files'), part.get('removed'))
+            changed += len(part.get('files') or [])
+            removed += len(part.get('removed') or [])
+
+        return {'changed_files': changed, 'removed_files': removed, **self.symbol_index.stats(agent_id)}
+
+    async def _ensure_symbol_index(self, agent_id: str) -> bool:
+        """True se há índice de símbolos para o agente (indexando agora se ele suporta e ainda não tem).
+
+        Espera o refresh por no máximo symbol_index_wait segundos e, se o último falhou há menos de
+        symbol_index_retry segundos, nem tenta: o pipeline segue sem filtrar por símbolos.
+        """
+        if self.symbol_index.has_index(agent_id):
+            return True
+        if not await self.agent_supports(agent_id, 'index_symbols'):
+            return False
+
+        task = self._symbol_refreshes.get(agent_id)
+        failed_at = self._symbol_refresh_failures.get(agent_id)
+        if (task is None or task.done()) and failed_at is not None and time.monotonic() - failed_at < self.symbol_index_retry:
+            return False
+
+        try:
+            # shield: cancelar um pipeline (ou o fim da espera) não cancela o refresh compartilhado
+            await asyncio.wait_for(asyncio.shield(self._start_symbol_refresh(agent_id)), self.symbol_index_wait)
+        except Exception:
+            pass
+
+        return self.symbol_index.has_index(agent_id)
+
+    async def _filter_knowledge_by_symbols(self, agent_id: str, relevant_knowledge: list) -> list:
+        """Mantém só os itens (e funções) que existem no checkout do agente; sem índice ou sem
+        nenhum item válido, devolve a lista original
+        """
+        if not await self._ensure_symbol_index(agent_id):
+            return relevant_knowledge
+
+        filtered = []
+        for item in relevant_knowledge:
+            resolved = self.symbol_index.resolve(agent_id, item['data'].get('file'), item['data'].get('functions'))
+            if resolved is None:
+                continue
+
+            filtered.append({
+                **item,
+                'data': {**item['data'], 'file': resolved['file_path'], 'functions': resolved['functions']}
+            })
+
+        return filtered or relevant_knowledge
+
+    def _resolve_target(self, agent_id: str, target_info: dict, relevant_knowledge: list) -> dict:
+        """Confere o alvo do LLM no índice de símbolos antes da leitura; corrige o caminho ou cai
+        para o melhor item de conhecimento válido. Sem índice, o alvo segue como veio.
+        """
+        if not self.symbol_index.has_index(agent_id):
+            return target_info
+
+        resolved = self.symbol_index.resolve(agent_id, target_info.get('target_file'), target_info.get('target_function'))
+        reasoning = target_info.get('reasoning', '')
+
+        if resolved is None:
+            for item in relevant_knowledge:
+                resolved = self.symbol_index.resolve(agent_id, item['data'].get('file'), item['data'].get('functions'))
+                if resolved is not None:
+                    reasoning += f" [alvo sugerido não existe no checkout do agente; usando o conhecimento {item['id']}]"
+                    break
+
+        if resolved is None:
+            raise ValueError("Nenhum alvo encontrado no índice de símbolos do agente")
+
+        return {
+            **target_info,
+            'target_file': resolved['file_path'],
+            'target_function': ', '.join(resolved['functions']),
+            'target_symbols': resolved['symbols'],
+            'reasoning': reasoning
+        }
+
+    async def _analyze_target_location(self, user_query: str, relevant_knowledge: list, use_cache: bool = True) -> dict:
         knowledge_context = self._build_knowledge_context(relevant_knowledge)
         analysis_prompt = self._build_analysis_prompt(user_query, knowledge_context)
         
-        client = self.factory.get_llm_model()
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Você é um especialista em OpenStack. Analise e retorne APENAS o JSON solicitado."
-                },
-                {
-                    "role": "user",
-                    "content": analysis_prompt,
-                }
-            ],
-            model="deepseek-r1-distill-llama-70b",
+        return await self._chat_completion(
+            analysis_prompt,
+            lambda llm_response: self._parse_target_info(llm_response, relevant_knowledge),
+            use_cache
         )
-        
-        llm_response = chat_completion.choices[0].message.content
-        return self._parse_target_info(llm_response, relevant_knowledge)
+    
+    async def _chat_completion(self, prompt: str, parse, use_cache: bool = True):
+        """Envia o prompt ao LLM e retorna parse(resposta).
+
+        Respostas que passam pelo parse ficam no cache endereçado por modelo + prompts;
+        use_cache=False ignora o cache na leitura (amostra nova) mas atualiza a entrada.
+        """
+        llm_config = self.factory.get_llm_config()
+        cache_key = LlmResponseCache.make_key(llm_config["model"], LLM_SYSTEM_PROMPT, prompt)
+
+        if use_cache:
+            cached_response = await asyncio.to_thread(self.llm_cache.get, cache_key)
+            if cached_response is not None:
+                return parse(cached_response)
+
+            # Mesmo prompt já em voo: aguarda a mesma resposta em vez de chamar o LLM de novo
+            llm_response = await self.llm_flight.do(cache_key, lambda: self._request_completion(prompt, llm_config))
+        else:
+            llm_response = await self._request_completion(prompt, llm_config)
+
+        result = parse(llm_response)
+
+        await asyncio.to_thread(self.llm_cache.put, cache_key, llm_response)
+        return result
+
+    async def _request_completion(self, prompt: str, llm_config: dict) -> str:
+        client = self.factory.get_llm_model()
+
+        async with self._llm_semaphore:
+            with timed_span("llm.chat_completion", LLM_REQUEST_DURATION, {'model': llm_config["model"]}) as span:
+                try:
+                    chat_completion = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            messages=[
+                                {
+                                    "role": "system",
+                                    "content": LLM_SYSTEM_PROMPT
+                                },
+                                {
+                                    "role": "user",
+                                    "content": prompt,
+                                }
+                            ],
+                            model=llm_config["model"],
+                        ),
+                        timeout=llm_config["timeout"]
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"LLM não respondeu em {llm_config['timeout']}s")
+
+                usage = getattr(chat_completion, 'usage', None)
+                if usage is not None:
+                    span.set_attribute('llm.prompt_tokens', usage.prompt_tokens or 0)
+                    span.set_attribute('llm.completion_tokens', usage.completion_tokens or 0)
+                    LLM_TOKENS.add(usage.prompt_tokens or 0, {'model': llm_config["model"], 'type': 'prompt'})
+                    LLM_TOKENS.add(usage.completion_tokens or 0, {'model': llm_config["model"], 'type': 'completion'})
+
+        return chat_completion.choices[0].message.content
     
     def _build_knowledge_context(self, relevant_knowledge: list) -> str:
         return "\n\n".join([
@@ -173,68 +849,224 @@ class AgentService:
             return self._get_fallback_target_info(relevant_knowledge)
     
     def _get_fallback_target_info(self, relevant_knowledge: list) -> dict:
+        # Prefere o item mais relevante que aponta uma função; sem nenhum, usa o primeiro só com o arquivo
+        item = next((item for item in relevant_knowledge if item['data'].get('functions')), relevant_knowledge[0])
         return {
-            "target_file": relevant_knowledge[0]['data']['file'],
-            "target_function": relevant_knowledge[0]['data']['functions'][0],
-            "reasoning": f"Maior similaridade semântica ({relevant_knowledge[0]['similarity']:.3f})",
-            "knowledge_used": [relevant_knowledge[0]['id']]
+            "target_file": item['data']['file'],
+            "target_function": (item['data'].get('functions') or [None])[0],
+            "reasoning": f"Maior relevância na busca de conhecimento ({item['similarity']:.3f})",
+            "knowledge_used": [item['id']]
         }
     
     async def _read_target_file(self, agent_id: str, target_info: dict) -> dict:
         """Lê o conteúdo do arquivo alvo através do agente"""
+        return await self.read_full_file(agent_id, target_info['target_file'], target_info['target_function'])
+
+    async def read_full_file(self, agent_id: str, file_path: str, functions=None) -> dict:
+        """Lê o arquivo do agente reaproveitando a cópia em cache quando o agente responde "unchanged"
+
+        O hash/mtime da cópia em cache vai no comando; agentes que não conhecem esses campos
+        simplesmente devolvem o arquivo inteiro. Leituras simultâneas do mesmo arquivo no mesmo
+        agente compartilham um único comando.
+        """
+        return await self.file_read_flight.do(
+            (agent_id, file_path),
+            lambda: self._read_full_file(agent_id, file_path, functions)
+        )
+
+    async def _read_full_file(self, agent_id: str, file_path: str, functions=None) -> dict:
+        cached = self.file_cache.get(agent_id, file_path)
         command = {
             'action': 'read_full_file',
-            'file_path': target_info['target_file'],
-            'functions': target_info['target_function']
+            'file_path': file_path,
+            'functions': functions,
+            # O servidor numera as linhas sozinho; o agente não precisa mandar o arquivo duas vezes
+            'include_lines': False
         }
-        
-        response = await self.send_command(agent_id, command)
-        return response['data']
+        if cached is not None:
+            command['known_hash'] = cached['hash']
+            command['known_mtime'] = cached['mtime']
+
+        if agent_id in self.active_agents and await self.agent_supports(agent_id, 'read_file_stream'):
+            data = await self._read_file_stream(agent_id, command)
+        else:
+            response = await self.send_command(agent_id, command)
+            data = response['data']
+
+        if cached is not None and data.get('unchanged'):
+            self.file_cache.hits += 1
+            return cached['data']
+
+        self.file_cache.misses += 1
+        self.file_cache.put(agent_id, file_path, data)
+        return data
     
-    async def _generate_mutation(self, target_info: dict, file_content: dict, user_query: str) -> dict:
-        mutation_prompt = self._build_mutation_prompt(target_info, file_content, user_query)
-        
-        client = self.factory.get_llm_model()
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
+    async def _read_file_stream(self, agent_id: str, command: dict) -> dict:
+        """read_full_file em partes de até STREAM_CHUNK_SIZE: cada "chunk" é anexado ao chegar, com
+        limite de STREAM_MAX_BYTES para o arquivo inteiro; a final traz hash/mtime e, opcionalmente, "size"
+        """
+        parts = []
+        received = {'bytes': 0}
+
+        def on_chunk(data: dict):
+            chunk = data.get('chunk')
+            if not chunk:
+                return
+
+            received['bytes'] += len(chunk.encode('utf-8'))
+            if received['bytes'] > self.stream_max_bytes:
+                raise HTTPException(status_code=413, detail=f"Arquivo maior que o limite de {self.stream_max_bytes} bytes")
+            parts.append(chunk)
+
+        response = await self.stream_command(agent_id, {
+            **command,
+            'action': 'read_file_stream',
+            'chunk_size': self.stream_chunk_size
+        }, on_chunk)
+
+        data = {key: value for key, value in (response.get('data') or {}).items() if key != 'chunk'}
+        if data.get('unchanged'):
+            return data
+
+        if data.get('size') is not None and data['size'] != received['bytes']:
+            raise HTTPException(status_code=502, detail=f"Leitura incompleta: {received['bytes']} de {data['size']} bytes")
+
+        data['content'] = ''.join(parts)
+        return data
+
+    async def _generate_mutation(self, target_info: dict, file_content: dict, user_query: str, use_cache: bool = True) -> dict:
+        code_slice = await self._slice_target_code(target_info, file_content)
+        mutation_prompt = self._build_mutation_prompt(target_info, code_slice, user_query)
+
+        mutation_info = await self._chat_completion(mutation_prompt, self._parse_mutation_info, use_cache)
+        return self._map_mutation_lines(mutation_info, code_slice)
+
+    async def _slice_target_code(self, target_info: dict, file_content: dict) -> dict:
+        """Só a(s) função(ões) alvo com a numeração original; o arquivo inteiro se não der para recortar.
+        O recorte roda fora do event loop (ast.parse de arquivos grandes leva centenas de ms)
+        """
+        source = file_content.get('content') or ''
+        target_function = target_info.get('target_function')
+        file_hash = file_content.get('hash')
+        key = (file_hash, frozenset(function_names(target_function)), self.mutation_context_lines)
+
+        if file_hash is not None and key in self._slice_ranges:
+            self._slice_ranges.move_to_end(key)
+            ranges = self._slice_ranges[key]
+        else:
+            ranges = await asyncio.to_thread(function_ranges, source, target_function, self.mutation_context_lines)
+            if file_hash is not None:
+                self._slice_ranges[key] = ranges
+                while len(self._slice_ranges) > self.slice_cache_size:
+                    self._slice_ranges.popitem(last=False)
+
+        if ranges is None:
+            return await asyncio.to_thread(number_lines, source)
+        return await asyncio.to_thread(slice_lines, source, ranges)
+
+    def _map_mutation_lines(self, mutation_info: dict, code_slice: dict) -> dict:
+        modifications = []
+        for mod in mutation_info.get('modifications', []):
+            line_number = map_line_number(mod.get('line_number'), code_slice)
+            if line_number is None:
+                print(f"Modificação descartada: linha {mod.get('line_number')} fora do código analisado")
+                continue
+            modifications.append({**mod, 'line_number': line_number})
+
+        if not modifications:
+            raise ValueError("Nenhuma modificação sugerida cai dentro do código analisado")
+
+        return {**mutation_info, 'modifications': modifications}
+
+    async def _generate_mutants(self, target_info: dict, file_content: dict, user_query: str, count: int, use_cache: bool = True) -> list:
+        """Até `count` mutantes distintos; descarta os repetidos e os que não mudam a linha original"""
+        code_slice = await self._slice_target_code(target_info, file_content)
+        lines = (file_content.get('content') or '').splitlines()
+        mutants, seen = [], set()
+
+        for attempt in range(MUTANT_GENERATION_ROUNDS):
+            mutation_prompt = self._build_mutation_prompt(target_info, code_slice, user_query, count - len(mutants))
+            # A partir da segunda rodada o cache é ignorado para o LLM sugerir mutantes novos
+            candidates = await self._chat_completion(mutation_prompt, self._parse_mutants, use_cache and attempt == 0)
+
+            for candidate in candidates:
+                try:
+                    mutation_info = self._map_mutation_lines(candidate, code_slice)
+                except ValueError:
+                    continue
+
+                modifications = [
+                    mod for mod in mutation_info['modifications']
+                    if isinstance(mod.get('new_content'), str)
+                    and mod['line_number'] <= len(lines)
+                    and mod['new_content'] != lines[mod['line_number'] - 1]
+                ]
+                key = tuple(sorted((mod['line_number'], mod['new_content']) for mod in modifications))
+                if not modifications or key in seen:
+                    continue
+
+                seen.add(key)
+                mutants.append({**mutation_info, 'modifications': modifications})
+                if len(mutants) == count:
+                    return mutants
+
+        if not mutants:
+            raise ValueError("Nenhum mutante válido foi gerado para o alvo")
+
+        return mutants
+
+    def _parse_mutants(self, llm_response: str) -> list:
+        mutation_info = self._parse_mutation_info(llm_response)
+        if isinstance(mutation_info.get('mutants'), list):
+            return [mutant for mutant in mutation_info['mutants'] if isinstance(mutant, dict)]
+        return [mutation_info]
+
+    def _build_mutation_prompt(self, target_info: dict, code_slice: dict, user_query: str, count: int = 1) -> str:
+        if count > 1:
+            quantity_rule = f"Gere {count} mutantes DIFERENTES entre si, cada um com UMA modificação em uma linha crítica"
+            response_format = """{
+            "mutants": [
                 {
-                    "role": "system",
-                    "content": "Você é um especialista em OpenStack. Analise e retorne APENAS o JSON solicitado."
-                },
+                    "modifications": [
+                        {
+                            "line_number": 123,
+                            "new_content": "código completo da linha modificada",
+                            "reason": "tipo de mutação aplicada"
+                        }
+                    ]
+                }
+            ]
+        }"""
+        else:
+            quantity_rule = "Faça UMA modificação por vez na linha mais crítica"
+            response_format = """{
+            "modifications": [
                 {
-                    "role": "user",
-                    "content": mutation_prompt,
+                    "line_number": 123,
+                    "new_content": "código completo da linha modificada",
+                    "reason": "tipo de mutação aplicada"
                 }
-            ],
-            model="deepseek-r1-distill-llama-70b",
-        )
-        
-        llm_response = chat_completion.choices[0].message.content
-        return self._parse_mutation_info(llm_response)
+            ]
+        }"""
 
-    def _build_mutation_prompt(self, target_info: dict, file_content: dict, user_query: str) -> str:
         return f"""
         Você é um especialista em mutation testing para sistemas críticos. Analise o código Python e introduza uma mutação sutil que cause o erro especificado.
 
         ARQUIVO: {target_info['target_file']}
+        FUNÇÃO ALVO: {target_info.get('target_function')}
 
-        CÓDIGO A MUTAR:
-        ```python
-        {file_content['content']}
-        ```
-
-        CÒDIGO POR LINHA:
-        {file_content['lines']}
+        CÓDIGO A MUTAR (cada linha prefixada pelo número real da linha no arquivo; "..." separa trechos):
+        {code_slice['text']}
 
         ERRO ALVO: {user_query}
 
         REGRAS DE MUTAÇÃO:
-        1. Faça UMA modificação por vez na linha mais crítica
+        1. {quantity_rule}
         2. Mantenha o código sintaticamente válido
         3. Prefira mutações sutis: troque operadores, altere condições, modifique valores
         4. Evite mudanças óbvias que seriam facilmente detectadas
         5. Foque em lógica de negócio, validações ou fluxo de controle
+        6. Use em "line_number" o número mostrado antes da linha e não inclua esse prefixo em "new_content"
 
         TIPOS DE MUTAÇÃO EFETIVOS:
         - Operadores: == → !=, < → <=, and → or
@@ -243,15 +1075,7 @@ class AgentService:
         - Chamadas: método() → método_errado()
 
         FORMATO DE RESPOSTA (JSON puro, sem markdown):
-        {{
-            "modifications": [
-                {{
-                    "line_number": 123,
-                    "new_content": "código completo da linha modificada",
-                    "reason": "tipo de mutação aplicada"
-                }}
-            ]
-        }}"""
+        {response_format}"""
 
     def _parse_mutation_info(self, llm_response: str) -> dict:
         json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
@@ -261,17 +1085,15 @@ class AgentService:
             raise ValueError("Não foi possível extrair JSON da resposta de mutação")
 
     async def _apply_mutations(self, agent_id: str, target_info: dict, mutation_info: dict) -> list:
-        results = []
-        
-        for mod in mutation_info['modifications']:
-            command = {
-                'action': 'modify_file',
+        modifications = [
+            {
                 'file_path': target_info['target_file'],
                 'line_number': mod['line_number'],
                 'new_content': mod['new_content']
             }
-            
-            response = await self.send_command(agent_id, command)
-            results.append(response['data'])
+            for mod in mutation_info['modifications']
+        ]
+
+        results = await self.apply_modifications(agent_id, modifications)
             
         return { "mutation": results }
\ No newline at end of file
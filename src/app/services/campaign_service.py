@@ -0,0 +1,469 @@
+from fastapi import HTTPException
+from typing import Dict
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
+import os
+import time
+import uuid
+from src.core.telemetry import register_gauge
+
+FINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+MUTANT_STATUSES = ('pending', 'running', 'killed', 'survived', 'timeout', 'error', 'skipped')
+
+# Intervalo (s) entre tentativas de pegar o lease de um agente ocupado por outra campanha/worker
+LEASE_RETRY_INTERVAL = 1.0
+
+# Falhas do agente (desconectado, fora do ar) devolvem o mutante à fila para outro agente
+AGENT_UNAVAILABLE_STATUS_CODES = (404, 503)
+
+def _failed_edits(results) -> list:
+    if not isinstance(results, list):
+        results = [results]
+    return [
+        result for result in results
+        if not isinstance(result, dict) or result.get('status') == 'error' or 'error' in result
+    ]
+
+def _ci_outcome(data) -> str:
+    """killed (testes falharam), survived (passaram) ou error, a partir da resposta do agente ou do callback"""
+    if not isinstance(data, dict):
+        return 'error'
+
+    outcome = str(data.get('outcome') or data.get('status') or '').lower()
+    if outcome in ('killed', 'failed', 'failure'):
+        return 'killed'
+    if outcome in ('survived', 'passed', 'success'):
+        return 'survived'
+    if isinstance(data.get('passed'), bool):
+        return 'survived' if data['passed'] else 'killed'
+    return 'error'
+
+class CampaignService:
+    """Campanhas de mutation testing: gera os mutantes uma vez e distribui os ciclos
+    aplicar → aguardar sinal do CI → reverter entre os agentes do pool, em paralelo.
+
+    Cada agente roda um mutante por vez (o checkout é um só): um lease por agente no registro
+    de agentes vale entre campanhas e entre workers, então duas campanhas nunca mutam o mesmo
+    checkout ao mesmo tempo. O estado da campanha fica no worker que a recebeu.
+    """
+
+    def __init__(self, agent_service):
+        self.agent_service = agent_service
+        self.campaigns: Dict[str, dict] = {}
+        self.max_mutants = int(os.environ.get("CAMPAIGN_MAX_MUTANTS", "100"))
+        self.ci_timeout = float(os.environ.get("CAMPAIGN_CI_TIMEOUT", "600"))
+        self.max_attempts = int(os.environ.get("CAMPAIGN_MAX_ATTEMPTS", "2"))
+        self.retention = float(os.environ.get("JOB_RETENTION", "3600"))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, list] = {}
+        self._agent_locks: Dict[str, asyncio.Lock] = {}
+
+        register_gauge(
+            "cimut_campaign_mutants",
+            "Mutantes das campanhas por status",
+            self._mutant_observations
+        )
+
+    def _mutant_observations(self) -> list:
+        counts = {status: 0 for status in MUTANT_STATUSES}
+        for campaign in self.campaigns.values():
+            for mutant in campaign['mutants']:
+                counts[mutant['status']] += 1
+        return [(count, {'status': status}) for status, count in counts.items()]
+
+    async def close(self):
+        for campaign_id in list(self._tasks):
+            self.cancel_campaign(campaign_id)
+
+    def _snapshot(self, campaign: dict) -> dict:
+        return {key: value for key, value in campaign.items() if not key.startswith('_')}
+
+    def _publish(self, campaign: dict, event: str):
+        snapshot = self._snapshot(campaign)
+        for queue in self._subscribers.get(campaign['campaign_id'], []):
+            queue.put_nowait({'event': event, 'campaign': snapshot})
+
+    def _set_stage(self, campaign: dict, stage: str):
+        campaign['stage'] = stage
+        self._publish(campaign, 'stage')
+
+    def _finish(self, campaign: dict, status: str, error: str = None):
+        for mutant in campaign['mutants']:
+            if mutant['status'] in ('pending', 'running'):
+                mutant['status'] = 'skipped'
+
+        campaign['status'] = status
+        campaign['error'] = error
+        campaign['summary'] = self._summary(campaign)
+        campaign['finished_at'] = datetime.now().isoformat()
+        campaign['_finished_monotonic'] = time.monotonic()
+        self._publish(campaign, 'status')
+
+    def _summary(self, campaign: dict) -> dict:
+        summary = {status: 0 for status in MUTANT_STATUSES}
+        for mutant in campaign['mutants']:
+            summary[mutant['status']] += 1
+
+        # Mutation score: mortos sobre os que tiveram veredito do CI
+        decided = summary['killed'] + summary['survived']
+        summary['mutation_score'] = round(summary['killed'] / decided, 4) if decided else None
+        return summary
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            campaign_id for campaign_id, campaign in self.campaigns.items()
+            if campaign['status'] in FINAL_STATUSES and now - campaign['_finished_monotonic'] > self.retention
+        ]
+        for campaign_id in expired:
+            self.campaigns.pop(campaign_id, None)
+            self._subscribers.pop(campaign_id, None)
+
+    def _get(self, campaign_id: str) -> dict:
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is None:
+            raise HTTPException(status_code=404, detail="Campanha não encontrada")
+        return campaign
+
+    async def submit(self, user_query: str = None, target: dict = None, mutants: int = 10, agent_ids: list = None,
+                     filters: dict = None, reference_agent_id: str = None, signal: str = 'agent',
+                     ci_action: str = 'run_tests', ci_timeout: float = None, max_parallel: int = None,
+                     use_cache: bool = True) -> dict:
+        self._prune()
+
+        campaign = {
+            'campaign_id': str(uuid.uuid4()),
+            'query': user_query,
+            'target': target,
+            'requested_mutants': min(mutants, self.max_mutants),
+            'signal': signal,
+            'ci_action': ci_action,
+            'ci_timeout': ci_timeout or self.ci_timeout,
+            'max_parallel': max_parallel,
+            'use_cache': use_cache,
+            'status': 'running',
+            'stage': None,
+            'target_file': None,
+            'target_function': None,
+            'reasoning': None,
+            'reference_agent_id': reference_agent_id,
+            'agents': {},
+            'mutants': [],
+            'summary': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            '_agent_ids': agent_ids,
+            '_filters': filters,
+            '_signals': {}
+        }
+
+        self.campaigns[campaign['campaign_id']] = campaign
+        task = asyncio.create_task(self._run(campaign))
+        self._tasks[campaign['campaign_id']] = task
+        task.add_done_callback(lambda done, campaign_id=campaign['campaign_id']: self._tasks.pop(campaign_id, None))
+
+        return self._snapshot(campaign)
+
+    def get_campaign(self, campaign_id: str) -> dict:
+        return self._snapshot(self._get(campaign_id))
+
+    def cancel_campaign(self, campaign_id: str) -> dict:
+        """Cancela a campanha; os mutantes em andamento ainda são revertidos antes de parar"""
+        campaign = self._get(campaign_id)
+
+        task = self._tasks.get(campaign_id)
+        if task is not None:
+            task.cancel()
+
+        return self._snapshot(campaign)
+
+    def report_result(self, campaign_id: str, mutant_id: str, outcome: str, details: dict = None) -> dict:
+        """Sinal do CI externo (signal='callback') para o mutante em execução"""
+        campaign = self._get(campaign_id)
+        future = campaign['_signals'].get(mutant_id)
+        if future is None or future.done():
+            raise HTTPException(status_code=409, detail="Mutante não está aguardando resultado do CI")
+
+        future.set_result({'outcome': outcome, **(details or {})})
+        return {'campaign_id': campaign_id, 'mutant_id': mutant_id, 'outcome': outcome}
+
+    async def subscribe(self, campaign_id: str):
+        """Gera eventos {'event', 'campaign'} a cada etapa e a cada mutante concluído, até a campanha terminar"""
+        campaign = self._get(campaign_id)
+
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(campaign_id, []).append(queue)
+
+        try:
+            yield {'event': 'snapshot', 'campaign': self._snapshot(campaign)}
+            if campaign['status'] in FINAL_STATUSES:
+                return
+
+            while True:
+                event = await queue.get()
+                yield event
+                if event['campaign']['status'] in FINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(campaign_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+
+    async def _run(self, campaign: dict):
+        try:
+            pool = await self.agent_service.select_agents(campaign['_agent_ids'], campaign['_filters'])
+            if not pool:
+                raise ValueError("Nenhum agente disponível para a campanha")
+
+            reference_agent_id = campaign['reference_agent_id'] or pool[0]
+            campaign['reference_agent_id'] = reference_agent_id
+
+            plan = await self.agent_service.plan_mutants(
+                reference_agent_id,
+                campaign['query'],
+                target=campaign['target'],
+                count=campaign['requested_mutants'],
+                use_cache=campaign['use_cache'],
+                on_stage=lambda stage: self._set_stage(campaign, stage)
+            )
+
+            campaign['target_file'] = plan['target_file']
+            campaign['target_function'] = plan['target_function']
+            campaign['reasoning'] = plan['reasoning']
+            campaign['mutants'] = [
+                {
+                    'mutant_id': f"m{idx + 1:03d}",
+                    'modifications': [
+                        {'file_path': plan['target_file'], 'line_number': mod['line_number'], 'new_content': mod['new_content']}
+                        for mod in mutant['modifications']
+                    ],
+                    'reason': '; '.join(mod.get('reason', '') for mod in mutant['modifications'] if mod.get('reason')),
+                    'status': 'pending',
+                    'agent_id': None,
+                    'attempts': 0,
+                    'ci': None,
+                    'reverted': None,
+                    'error': None,
+                    'started_at': None,
+                    'finished_at': None,
+                    'duration_ms': None
+                }
+                for idx, mutant in enumerate(plan['mutants'])
+            ]
+
+            self._set_stage(campaign, 'preparing_agents')
+            original_lines = (plan['file_content'].get('content') or '').splitlines()
+            workers = await self._prepare_agents(campaign, pool, plan['file_content'])
+            if not workers:
+                raise ValueError("Nenhum agente do pool tem o arquivo alvo idêntico ao do agente de referência")
+
+            self._set_stage(campaign, 'running_mutants')
+            queue = asyncio.Queue()
+            for mutant in campaign['mutants']:
+                queue.put_nowait(mutant)
+
+            if campaign['max_parallel']:
+                workers = workers[:campaign['max_parallel']]
+            await self._run_workers(campaign, workers, queue, original_lines)
+
+            # Só sobra mutante pendente quando todos os agentes do pool saíram dele
+            leftover = [mutant for mutant in campaign['mutants'] if mutant['status'] == 'pending']
+            for mutant in leftover:
+                mutant['status'] = 'error'
+                mutant['error'] = "Nenhum agente disponível para executar o mutante"
+
+            self._finish(campaign, 'succeeded')
+        except asyncio.CancelledError:
+            self._finish(campaign, 'cancelled')
+            raise
+        except Exception as e:
+            self._finish(campaign, 'failed', error=str(e))
+
+    async def _prepare_agents(self, campaign: dict, pool: list, reference_file: dict) -> list:
+        """Agentes aptos: suportam a ação de CI (signal='agent') e têm o arquivo alvo igual ao da referência"""
+        async def check(agent_id: str):
+            if campaign['signal'] == 'agent' and not await self.agent_service.agent_supports(agent_id, campaign['ci_action']):
+                return f"Agente não suporta a ação {campaign['ci_action']}"
+
+            if agent_id == campaign['reference_agent_id']:
+                return None
+
+            try:
+                file_content = await self.agent_service.read_full_file(agent_id, campaign['target_file'], campaign['target_function'])
+            except HTTPException as e:
+                return f"Erro lendo o arquivo alvo: {e.detail}"
+
+            same_hash = file_content.get('hash') and file_content.get('hash') == reference_file.get('hash')
+            if not same_hash and file_content.get('content') != reference_file.get('content'):
+                return "Arquivo alvo diferente do agente de referência"
+            return None
+
+        reasons = await asyncio.gather(*(check(agent_id) for agent_id in pool))
+
+        workers = []
+        for agent_id, reason in zip(pool, reasons):
+            campaign['agents'][agent_id] = {
+                'status': 'excluded' if reason else 'idle',
+                'mutants_run': 0,
+                'reason': reason
+            }
+            if reason is None:
+                workers.append(agent_id)
+
+        return workers
+
+    async def _run_workers(self, campaign: dict, workers: list, queue: asyncio.Queue, original_lines: list):
+        """Um worker por agente até todos os mutantes terminarem (queue.join) ou não restar agente no pool.
+
+        Os workers continuam esperando na fila enquanto houver mutante em andamento: um mutante
+        devolvido por um agente que caiu é pego pelo próximo agente livre.
+        """
+        worker_tasks = [
+            asyncio.create_task(self._agent_worker(campaign, agent_id, queue, original_lines))
+            for agent_id in workers
+        ]
+        all_done = asyncio.ensure_future(queue.join())
+        workers_gone = asyncio.gather(*worker_tasks, return_exceptions=True)
+
+        try:
+            await asyncio.wait({all_done, workers_gone}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Ao cancelar a campanha, os mutantes em andamento são revertidos antes de os workers saírem
+            for task in worker_tasks:
+                task.cancel()
+            await asyncio.gather(*worker_tasks, return_exceptions=True)
+            all_done.cancel()
+
+    async def _agent_worker(self, campaign: dict, agent_id: str, queue: asyncio.Queue, original_lines: list):
+        agent = campaign['agents'][agent_id]
+        lock = self._agent_locks.setdefault(agent_id, asyncio.Lock())
+
+        while True:
+            mutant = await queue.get()
+            try:
+                async with lock, self._agent_lease(campaign, agent_id):
+                    agent['status'] = 'busy'
+                    try:
+                        await self._run_mutant(campaign, agent_id, mutant, original_lines)
+                    finally:
+                        agent['status'] = 'idle'
+
+                # Agente indisponível: o mutante volta para a fila (antes do task_done, para o join não terminar)
+                if mutant['status'] == 'pending':
+                    if mutant['attempts'] < self.max_attempts:
+                        queue.put_nowait(mutant)
+                    else:
+                        mutant['status'] = 'error'
+
+                if mutant['status'] in ('killed', 'survived', 'timeout', 'error'):
+                    agent['mutants_run'] += 1
+                    self._publish(campaign, 'mutant')
+            finally:
+                queue.task_done()
+
+            # Agente fora do ar ou com checkout sujo (revert falhou) sai do pool desta campanha
+            if agent['reason'] is not None:
+                agent['status'] = 'excluded'
+                return
+
+    @asynccontextmanager
+    async def _agent_lease(self, campaign: dict, agent_id: str):
+        """Lease do checkout do agente no registro compartilhado; espera se outra campanha (de qualquer worker) o tem.
+        O prazo cobre o ciclo inteiro (aplicar, CI, reverter) e expira sozinho se este worker morrer
+        """
+        registry = self.agent_service.registry
+        name = f"agent:{agent_id}"
+        owner = f"{registry.worker_id}:{campaign['campaign_id']}"
+        ttl = campaign['ci_timeout'] + 2 * self.agent_service.get_command_timeout('modify_files') + 60
+
+        while not await registry.acquire_lease(name, owner, ttl):
+            await asyncio.sleep(LEASE_RETRY_INTERVAL)
+
+        try:
+            yield
+        finally:
+            try:
+                await registry.release_lease(name, owner)
+            except Exception as e:
+                print(f"Erro liberando o lease do agente {agent_id}: {e}")
+
+    async def _run_mutant(self, campaign: dict, agent_id: str, mutant: dict, original_lines: list):
+        """Um ciclo aplicar → sinal do CI → reverter; o revert roda mesmo se a campanha for cancelada"""
+        mutant.update({
+            'status': 'running',
+            'agent_id': agent_id,
+            'attempts': mutant['attempts'] + 1,
+            'started_at': datetime.now().isoformat(),
+            'error': None
+        })
+        self._publish(campaign, 'mutant')
+        started_at = time.perf_counter()
+
+        try:
+            results = await self.agent_service.apply_modifications(agent_id, mutant['modifications'])
+            failed = _failed_edits(results)
+            if failed:
+                mutant['status'] = 'error'
+                mutant['error'] = f"Falha aplicando o mutante: {failed[0]}"
+                return
+
+            mutant['ci'] = await self._wait_ci_signal(campaign, agent_id, mutant)
+            mutant['status'] = _ci_outcome(mutant['ci']) if mutant['ci'] is not None else 'timeout'
+        except HTTPException as e:
+            if e.status_code in AGENT_UNAVAILABLE_STATUS_CODES:
+                campaign['agents'][agent_id]['reason'] = f"Agente indisponível: {e.detail}"
+                mutant['status'] = 'pending'
+            else:
+                mutant['status'] = 'timeout' if e.status_code == 408 else 'error'
+            mutant['error'] = e.detail
+        except Exception as e:
+            mutant['status'] = 'error'
+            mutant['error'] = str(e)
+        finally:
+            campaign['_signals'].pop(mutant['mutant_id'], None)
+            # Sempre reverte: reescrever as linhas originais é inofensivo se o apply não chegou ao agente
+            await asyncio.shield(self._revert(campaign, agent_id, mutant, original_lines))
+            mutant['finished_at'] = datetime.now().isoformat()
+            mutant['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 2)
+
+    async def _wait_ci_signal(self, campaign: dict, agent_id: str, mutant: dict):
+        """Resposta da ação de CI do agente ou do callback externo; None em timeout"""
+        if campaign['signal'] == 'callback':
+            future = asyncio.get_running_loop().create_future()
+            campaign['_signals'][mutant['mutant_id']] = future
+            try:
+                return await asyncio.wait_for(future, timeout=campaign['ci_timeout'])
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            response = await self.agent_service.send_command(agent_id, {
+                'action': campaign['ci_action'],
+                'campaign_id': campaign['campaign_id'],
+                'mutant_id': mutant['mutant_id'],
+                'files': list(dict.fromkeys(mod['file_path'] for mod in mutant['modifications']))
+            }, timeout=campaign['ci_timeout'])
+        except HTTPException as e:
+            if e.status_code == 408:
+                return None
+            raise
+
+        return response.get('data')
+
+    async def _revert(self, campaign: dict, agent_id: str, mutant: dict, original_lines: list):
+        """Volta as linhas tocadas ao conteúdo original do agente de referência"""
+        modifications = [
+            {**mod, 'new_content': original_lines[mod['line_number'] - 1]}
+            for mod in mutant['modifications']
+        ]
+
+        try:
+            failed = _failed_edits(await self.agent_service.apply_modifications(agent_id, modifications))
+        except Exception as e:
+            failed = [str(getattr(e, 'detail', e))]
+
+        mutant['reverted'] = not failed
+        if failed:
+            campaign['agents'][agent_id]['reason'] = campaign['agents'][agent_id]['reason'] or f"Revert falhou: {failed[0]}"
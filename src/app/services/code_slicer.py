@@ -0,0 +1,76 @@
+import ast
+from src.app.data.symbol_index import function_names
+
+def _merge_ranges(ranges: list) -> list:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def function_ranges(source: str, target_function, context_lines: int = 5):
+    """Intervalos (início, fim) das funções alvo (com decorators) e `context_lines` linhas em volta,
+    com a numeração original do arquivo, ou None se o código não for Python válido ou
+    nenhuma função alvo for encontrada. É a parte cara do recorte (ast.parse do arquivo inteiro).
+    """
+    names = function_names(target_function)
+    if not names:
+        return None
+
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    line_count = len(source.splitlines())
+    ranges = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in names:
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            ranges.append((max(start - context_lines, 1), min(node.end_lineno + context_lines, line_count)))
+
+    return _merge_ranges(ranges) if ranges else None
+
+def slice_lines(source: str, ranges: list) -> dict:
+    """Recorte das linhas em `ranges`: {'line_numbers': [...], 'text': "N: linha" por linha, 'ranges': [(início, fim)]}"""
+    lines = source.splitlines()
+    ranges = [(start, min(end, len(lines))) for start, end in ranges if start <= len(lines)]
+    line_numbers = [number for start, end in ranges for number in range(start, end + 1)]
+
+    text_parts = []
+    for idx, (start, end) in enumerate(ranges):
+        if idx > 0:
+            text_parts.append("...")
+        text_parts.extend(f"{number}: {lines[number - 1]}" for number in range(start, end + 1))
+
+    return {
+        'line_numbers': line_numbers,
+        'text': "\n".join(text_parts),
+        'ranges': ranges
+    }
+
+def number_lines(source: str) -> dict:
+    """Arquivo inteiro numerado, no mesmo formato de slice_lines (fallback sem recorte)"""
+    lines = source.splitlines()
+    return {
+        'line_numbers': list(range(1, len(lines) + 1)),
+        'text': "\n".join(f"{idx + 1}: {line}" for idx, line in enumerate(lines)),
+        'ranges': [(1, len(lines))] if lines else []
+    }
+
+def map_line_number(line_number, code_slice: dict):
+    """Converte o número de linha devolvido pelo LLM para a linha real do arquivo.
+
+    O recorte é enviado com a numeração original, então só números dentro dele são aceitos.
+    Retorna None para qualquer outro (a modificação é descartada).
+    """
+    try:
+        line_number = int(line_number)
+    except (TypeError, ValueError):
+        return None
+
+    if any(start <= line_number <= end for start, end in code_slice['ranges']):
+        return line_number
+    return None
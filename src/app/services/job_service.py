@@ -0,0 +1,195 @@
+from fastapi import HTTPException
+from typing import Dict
+from datetime import datetime
+import asyncio
+import os
+import time
+import uuid
+from src.core.telemetry import register_gauge
+
+FINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+class JobService:
+    """Executa o pipeline find-fault-target em segundo plano, com fila limitada e pool fixo de workers"""
+
+    def __init__(self, agent_service):
+        self.agent_service = agent_service
+        self.jobs: Dict[str, dict] = {}
+        self.max_workers = int(os.environ.get("JOB_WORKERS", "4"))
+        self.max_queue = int(os.environ.get("JOB_QUEUE_LIMIT", "100"))
+        self.retention = float(os.environ.get("JOB_RETENTION", "3600"))
+        self._queue = None
+        self._workers = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, list] = {}
+
+        register_gauge(
+            "cimut_jobs",
+            "Jobs find-fault-target por status",
+            self._job_observations
+        )
+
+    def _job_observations(self) -> list:
+        counts = {status: 0 for status in ('queued', 'running') + FINAL_STATUSES}
+        for job in self.jobs.values():
+            counts[job['status']] += 1
+        return [(count, {'status': status}) for status, count in counts.items()]
+
+    async def start(self):
+        if self._workers:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    async def close(self):
+        for job_id in list(self._running):
+            self.cancel_job(job_id)
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def _snapshot(self, job: dict) -> dict:
+        return {key: value for key, value in job.items() if not key.startswith('_')}
+
+    def _publish(self, job: dict, event: str):
+        snapshot = self._snapshot(job)
+        for queue in self._subscribers.get(job['job_id'], []):
+            queue.put_nowait({'event': event, 'job': snapshot})
+
+    def _set_stage(self, job: dict, stage: str):
+        now = datetime.now().isoformat()
+        if job['stages']:
+            job['stages'][-1]['finished_at'] = now
+        job['stage'] = stage
+        job['stages'].append({'stage': stage, 'started_at': now, 'finished_at': None})
+        self._publish(job, 'stage')
+
+    def _finish(self, job: dict, status: str, result: dict = None, error: str = None):
+        now = datetime.now().isoformat()
+        if job['stages'] and job['stages'][-1]['finished_at'] is None:
+            job['stages'][-1]['finished_at'] = now
+        job['status'] = status
+        job['result'] = result
+        job['error'] = error
+        job['finished_at'] = now
+        job['_finished_monotonic'] = time.monotonic()
+        self._publish(job, 'status')
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['status'] in FINAL_STATUSES and now - job['_finished_monotonic'] > self.retention
+        ]
+        for job_id in expired:
+            self.jobs.pop(job_id, None)
+            self._subscribers.pop(job_id, None)
+
+    async def submit(self, agent_id: str, user_query: str, use_cache: bool = True) -> dict:
+        await self.start()
+        self._prune()
+
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'agent_id': agent_id,
+            'query': user_query,
+            'use_cache': use_cache,
+            'status': 'queued',
+            'stage': None,
+            'stages': [],
+            'result': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None
+        }
+
+        try:
+            self._queue.put_nowait(job['job_id'])
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=429, detail="Fila de jobs cheia, tente novamente mais tarde")
+
+        self.jobs[job['job_id']] = job
+        return self._snapshot(job)
+
+    def get_job(self, job_id: str) -> dict:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        return self._snapshot(job)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def cancel_job(self, job_id: str) -> dict:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+
+        if job['status'] == 'queued':
+            # Continua na fila, mas o worker descarta jobs que não estão mais 'queued'
+            self._finish(job, 'cancelled')
+        elif job['status'] == 'running':
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+
+        return self._snapshot(job)
+
+    async def subscribe(self, job_id: str):
+        """Gera eventos {'event', 'job'} a cada mudança de etapa até o job terminar"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+
+        try:
+            yield {'event': 'snapshot', 'job': self._snapshot(job)}
+            if job['status'] in FINAL_STATUSES:
+                return
+
+            while True:
+                event = await queue.get()
+                yield event
+                if event['job']['status'] in FINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is None or job['status'] != 'queued':
+                    continue
+
+                job['status'] = 'running'
+                task = asyncio.create_task(self.agent_service.llm_injection_fault(
+                    job['agent_id'],
+                    job['query'],
+                    use_cache=job['use_cache'],
+                    on_stage=lambda stage, job=job: self._set_stage(job, stage)
+                ))
+                self._running[job_id] = task
+
+                try:
+                    result = await task
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise
+                    self._finish(job, 'cancelled')
+                    continue
+                finally:
+                    self._running.pop(job_id, None)
+
+                if 'error' in result:
+                    self._finish(job, 'failed', error=result['error'])
+                else:
+                    self._finish(job, 'succeeded', result=result)
+            finally:
+                self._queue.task_done()
@@ -1,3 +1,5 @@
 from .factory import Factory
+from .rate_limiter import RateLimiter
+from .single_flight import SingleFlight
 
-__all__ = [ "Factory" ]
+__all__ = [ "Factory", "RateLimiter", "SingleFlight" ]
@@ -1,20 +1,50 @@
-from src.core.providers import EmbeddingManager, LlmModel
+from src.core.providers import AgentRegistryManager, EmbeddingManager, LlmModel
 
 class Factory:
     def __init__(self) -> None:
         self.__embeder_model = None
+        self.__llm_provider = None
         self.__llm_model = None
+        self.__agent_registry = None
         
     def get_embedding_model(self):
         if self.__embeder_model is None:
-            embedding_model = EmbeddingManager()
-            self.__embeder_model = embedding_model.get_embedding_model()
+            embedding_manager = EmbeddingManager()
+            self.__embeder_model = embedding_manager.get_embedding_model()
         
         return self.__embeder_model
+
+    def _get_llm_provider(self) -> LlmModel:
+        if self.__llm_provider is None:
+            self.__llm_provider = LlmModel()
+
+        return self.__llm_provider
     
     def get_llm_model(self):
         if self.__llm_model is None:
-            llm_model = LlmModel()
-            self.__llm_model = llm_model.get_llm_model()
+            self.__llm_model = self._get_llm_provider().get_llm_model()
+
+        return self.__llm_model
+
+    def get_agent_registry(self):
+        if self.__agent_registry is None:
+            registry_manager = AgentRegistryManager()
+            self.__agent_registry = registry_manager.get_agent_registry()
+
+        return self.__agent_registry
+
+    def get_llm_config(self):
+        return self._get_llm_provider().get_llm_config()
+
+    async def close(self):
+        if self.__embeder_model is not None:
+            await self.__embeder_model.close()
+            self.__embeder_model = None
+
+        if self.__llm_provider is not None:
+            await self.__llm_provider.close()
+            self.__llm_model = None
 
-        return self.__llm_model
\ No newline at end of file
+        if self.__agent_registry is not None:
+            await self.__agent_registry.close()
+            self.__agent_registry = None
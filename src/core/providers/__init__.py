@@ -1,4 +1,5 @@
-from src.core.providers.embedding_manager import EmbeddingManager
+from src.core.providers.agent_registry import AgentRegistry, AgentRegistryManager, RedisAgentRegistry
+from src.core.providers.embedding_manager import EmbeddingManager, HashingEmbedder, HuggingFaceEmbedder, OnnxEmbedder
 from src.core.providers.llm_model import LlmModel
 
-__all__ = ["EmbeddingManager", "LlmModel"]
+__all__ = ["AgentRegistry", "AgentRegistryManager", "RedisAgentRegistry", "EmbeddingManager", "HashingEmbedder", "HuggingFaceEmbedder", "OnnxEmbedder", "LlmModel"]
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+
+# Renova/libera o lease só se ele ainda pertence a quem pede
+RENEW_LEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+RELEASE_LEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+class AgentRegistry:
+    """Registro de agentes em processo: todo agente conhecido está conectado a este worker"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._agents = {}
+        self._leases = {}
+        self._handler = None
+
+    async def start(self, handler):
+        """handler(agent_id, command, timeout) executa um comando vindo de outro worker"""
+        self._handler = handler
+
+    async def register(self, agent_id: str, info: dict):
+        self._agents[agent_id] = {**info, 'worker_id': self.worker_id}
+
+    async def unregister(self, agent_id: str, info: dict):
+        self._agents[agent_id] = {**info, 'worker_id': None}
+
+    async def get_agent(self, agent_id: str):
+        return self._agents.get(agent_id)
+
+    async def list_agents(self) -> dict:
+        return dict(self._agents)
+
+    async def get_owner(self, agent_id: str):
+        """Worker que mantém o WebSocket do agente, ou None se o agente estiver offline"""
+        info = await self.get_agent(agent_id)
+        if info is None or info.get('status') != 'online':
+            return None
+        return info.get('worker_id')
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Lease exclusivo com expiração (ex.: o checkout de um agente durante um mutante).
+        True se ficou com `owner` (ou já era dele, renovando o prazo)
+        """
+        now = time.monotonic()
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > now:
+            return False
+
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    async def release_lease(self, name: str, owner: str):
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] == owner:
+            del self._leases[name]
+
+    async def forward(self, worker_id: str, agent_id: str, command: dict, timeout: float, wait_timeout: float = None) -> dict:
+        """Executa o comando no worker dono do agente; retorna {'ok', 'response' | 'status_code', 'detail'}"""
+        raise ConnectionError(f"Worker {worker_id} inacessível: o registro em processo não encaminha comandos")
+
+    async def close(self):
+        pass
+
+class RedisAgentRegistry(AgentRegistry):
+    """Registro compartilhado entre workers/nós via Redis.
+
+    Os agentes ficam em um hash ({prefix}:agents) com o worker dono do WebSocket. Cada
+    worker assina o canal {prefix}:worker:{worker_id}, por onde recebe comandos
+    encaminhados e as respostas dos comandos que encaminhou, e mantém uma chave de
+    heartbeat com TTL para que agentes de um worker morto apareçam como offline.
+    """
+
+    def __init__(self, client, prefix: str = "cimut", heartbeat_ttl: float = 15.0):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.heartbeat_ttl = heartbeat_ttl
+        self._pending = {}
+        self._pubsub = None
+        self._tasks = []
+        self._serving = set()
+        self._listening = False
+
+    @property
+    def _agents_key(self) -> str:
+        return f"{self.prefix}:agents"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}:alive"
+
+    def _channel(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}"
+
+    @staticmethod
+    def _decode(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    async def start(self, handler):
+        self._handler = handler
+        await self._beat()
+
+        await self._subscribe()
+
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._heartbeat())
+        ]
+
+    async def _beat(self):
+        await self.client.set(self._worker_key(self.worker_id), "1", ex=max(1, int(self.heartbeat_ttl)))
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            # Sem listener o worker não recebe comandos encaminhados: deixa o heartbeat
+            # expirar para que os outros workers vejam seus agentes como offline
+            if not self._listening:
+                continue
+            try:
+                await self._beat()
+            except Exception as e:
+                print(f"Erro ao renovar heartbeat do worker {self.worker_id}: {e}")
+
+    async def _subscribe(self):
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self._channel(self.worker_id))
+        self._listening = True
+
+    async def _listen(self):
+        """Consome o canal do worker; se a conexão cair, refaz a inscrição com backoff"""
+        delay = 0.5
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    await self._beat()
+                    print(f"Worker {self.worker_id} reinscrito no canal do registro")
+                delay = 0.5
+
+                async for message in self._pubsub.listen():
+                    self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro no listener do registro (worker {self.worker_id}): {e}")
+
+            self._listening = False
+            if self._pubsub is not None:
+                try:
+                    await self._pubsub.aclose()
+                except Exception:
+                    pass
+                self._pubsub = None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.heartbeat_ttl)
+
+    def _dispatch(self, message: dict):
+        if message.get('type') != 'message':
+            return
+
+        try:
+            payload = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+
+        if payload.get('type') == 'request':
+            task = asyncio.create_task(self._serve(payload))
+            self._serving.add(task)
+            task.add_done_callback(self._serving.discard)
+        elif payload.get('type') == 'reply':
+            future = self._pending.pop(payload.get('request_id'), None)
+            if future is not None and not future.done():
+                future.set_result(payload)
+
+    async def _serve(self, payload: dict):
+        reply = {'type': 'reply', 'request_id': payload['request_id']}
+
+        try:
+            reply['response'] = await self._handler(payload['agent_id'], payload['command'], payload.get('timeout'))
+            reply['ok'] = True
+        except Exception as e:
+            reply['ok'] = False
+            reply['status_code'] = getattr(e, 'status_code', 500)
+            reply['detail'] = getattr(e, 'detail', str(e))
+
+        await self.client.publish(self._channel(payload['reply_to']), json.dumps(reply))
+
+    async def register(self, agent_id: str, info: dict):
+        await self.client.hset(self._agents_key, agent_id, json.dumps({**info, 'worker_id': self.worker_id}))
+
+    async def unregister(self, agent_id: str, info: dict):
+        # Só marca offline se o agente ainda pertence a este worker (pode ter reconectado em outro)
+        current = await self.get_agent(agent_id)
+        if current is not None and current.get('worker_id') not in (self.worker_id, None):
+            return
+
+        await self.client.hset(self._agents_key, agent_id, json.dumps({**info, 'worker_id': None}))
+
+    async def _alive_workers(self, worker_ids) -> set:
+        alive = set()
+        for worker_id in set(worker_ids):
+            if worker_id and await self.client.exists(self._worker_key(worker_id)):
+                alive.add(worker_id)
+        return alive
+
+    def _with_liveness(self, info: dict, alive: set) -> dict:
+        if info.get('status') == 'online' and info.get('worker_id') not in alive:
+            return {**info, 'status': 'offline', 'worker_id': None}
+        return info
+
+    async def get_agent(self, agent_id: str):
+        raw = await self.client.hget(self._agents_key, agent_id)
+        if raw is None:
+            return None
+
+        info = json.loads(raw)
+        return self._with_liveness(info, await self._alive_workers([info.get('worker_id')]))
+
+    async def list_agents(self) -> dict:
+        raw_agents = await self.client.hgetall(self._agents_key)
+        agents = {self._decode(agent_id): json.loads(raw) for agent_id, raw in raw_agents.items()}
+        alive = await self._alive_workers(info.get('worker_id') for info in agents.values())
+
+        return {agent_id: self._with_liveness(info, alive) for agent_id, info in agents.items()}
+
+    def _lease_key(self, name: str) -> str:
+        return f"{self.prefix}:lease:{name}"
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        key, ttl_ms = self._lease_key(name), max(1, int(ttl * 1000))
+        if await self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return bool(await self.client.eval(RENEW_LEASE_SCRIPT, 1, key, owner, ttl_ms))
+
+    async def release_lease(self, name: str, owner: str):
+        await self.client.eval(RELEASE_LEASE_SCRIPT, 1, self._lease_key(name), owner)
+
+    async def forward(self, worker_id: str, agent_id: str, command: dict, timeout: float, wait_timeout: float = None) -> dict:
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        try:
+            receivers = await self.client.publish(self._channel(worker_id), json.dumps({
+                'type': 'request',
+                'request_id': request_id,
+                'reply_to': self.worker_id,
+                'agent_id': agent_id,
+                'command': command,
+                'timeout': timeout
+            }))
+            if not receivers:
+                raise ConnectionError(f"Worker {worker_id} não está ouvindo")
+
+            return await asyncio.wait_for(future, timeout=wait_timeout or timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        for task in self._tasks + list(self._serving):
+            task.cancel()
+        self._tasks = []
+        self._serving.clear()
+        self._listening = False
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Registro encerrado"))
+        self._pending.clear()
+
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+        await self.client.delete(self._worker_key(self.worker_id))
+        await self.client.aclose()
+
+class AgentRegistryManager:
+    def __init__(self):
+        self.redis_url = os.environ.get("REDIS_URL")
+        self.prefix = os.environ.get("AGENT_REGISTRY_PREFIX", "cimut")
+
+    def get_agent_registry(self):
+        if not self.redis_url:
+            return AgentRegistry()
+
+        import redis.asyncio as redis
+
+        client = redis.from_url(self.redis_url, decode_responses=True)
+        return RedisAgentRegistry(client, prefix=self.prefix)
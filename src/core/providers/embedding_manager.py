@@ -1,15 +1,315 @@
+from collections import Counter
+from src.core.rate_limiter import RateLimiter
+from src.core.telemetry import EMBEDDING_REQUEST_DURATION, timed_span
+import numpy as np
+import asyncio
+import httpx
+import math
 import os
+import random
+import re
+import zlib
+
+class HuggingFaceEmbedder:
+    """Embeddings pela inference API do HuggingFace (feature-extraction), com retry, rate limit e pool HTTP.
+
+    Todos os backends expõem a mesma interface: name, dimension, batch_size,
+    `await embed(texts)` (um vetor ou None por texto) e `await close()`.
+    """
+
+    def __init__(self, url: str, token: str, dimension: int, name: str = "codebert-base", timeout: float = 30.0,
+                 max_concurrency: int = 4, max_backoff: float = 20.0, batch_size: int = 8, rate_limit: float = 5.0):
+        self.name = name
+        self.url = url
+        self.token = token
+        self.dimension = dimension
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.rate_limiter = RateLimiter(rate_limit, burst=max_concurrency)
+        self._http_client = None
+        self._semaphore = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0
+                ),
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.token}"
+                }
+            )
+
+        return self._http_client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    def _backoff_delay(self, attempt: int, base: float) -> float:
+        delay = min(base * (2 ** attempt), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _pool_embedding(self, output):
+        if not isinstance(output, list) or len(output) == 0:
+            return None
+
+        try:
+            vector = np.asarray(output, dtype=np.float32)
+        except ValueError:
+            return None
+
+        # Saída por token ([tokens, dim] ou [1, tokens, dim]): mean pooling até sobrar um vetor
+        while vector.ndim > 1:
+            vector = vector.mean(axis=0)
+
+        return vector.tolist()
+
+    async def _request_embeddings(self, inputs, max_retries: int = 3):
+        payload = {
+            "inputs": inputs,
+            "options": {
+                "wait_for_model": True,
+                "use_cache": True
+            }
+        }
+
+        client = self._get_http_client()
+
+        for attempt in range(max_retries):
+            delay = 0.0
+
+            try:
+                await self.rate_limiter.acquire()
+
+                # O semáforo limita apenas as requisições em voo; o backoff acontece fora dele
+                async with self._get_semaphore():
+                    kind = 'batch' if isinstance(inputs, list) else 'single'
+                    with timed_span("embedding.request", EMBEDDING_REQUEST_DURATION, {'kind': kind, 'backend': 'huggingface'}) as span:
+                        response = await client.post(self.url, json=payload)
+                        span.set_attribute('http.status_code', response.status_code)
+
+                if response.status_code == 200:
+                    return response.json()
+
+                elif response.status_code == 503:
+                    print(f"Modelo carregando... tentativa {attempt + 1}")
+                    estimated_time = None
+                    try:
+                        estimated_time = response.json().get("estimated_time")
+                    except Exception:
+                        pass
+                    if estimated_time:
+                        delay = min(float(estimated_time), self.max_backoff)
+                    else:
+                        delay = self._backoff_delay(attempt, 5.0)
+
+                elif response.status_code == 401:
+                    print(f"Erro 401 - API requer autenticação. Configure HUGGINGFACE_TOKEN")
+                    return None
+
+                else:
+                    print(f"Erro API: {response.status_code}")
+                    delay = self._backoff_delay(attempt, 1.0)
+
+            except Exception as e:
+                print(f"Erro na tentativa {attempt + 1}: {e}")
+                delay = self._backoff_delay(attempt, 2.0)
+
+            if delay > 0 and attempt < max_retries - 1:
+                await asyncio.sleep(delay)
+
+        return None
+
+    async def embed(self, texts: list, max_retries: int = 3) -> list:
+        if len(texts) == 1:
+            return [self._pool_embedding(await self._request_embeddings(texts[0][:512], max_retries))]
+
+        output = await self._request_embeddings([text[:512] for text in texts], max_retries)
+
+        if not isinstance(output, list) or len(output) != len(texts):
+            return [None] * len(texts)
+
+        return [self._pool_embedding(item) for item in output]
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+class HashingEmbedder:
+    """Embedder em processo, sem rede nem GPU: n-gramas de caracteres e palavras no hashing trick.
+
+    Cada feature cai em uma posição do vetor pelo CRC32 (estável entre processos), com sinal
+    pelo bit mais alto para as colisões se cancelarem, e peso TF sublinear (1 + log tf).
+    Identificadores como _build_and_run_instance também contam por partes. Não usa IDF:
+    o vetor de um texto não depende do resto da base, então o store incremental continua válido.
+    """
+
+    def __init__(self, dimension: int, name: str = None, ngram_range: tuple = (3, 5), batch_size: int = 64):
+        self.name = name or f"hashing-ngram-{ngram_range[0]}-{ngram_range[1]}"
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.batch_size = batch_size
+
+    def _features(self, text: str) -> list:
+        words = re.findall(r'\w+', text.lower())
+        features = [f"w:{word}" for word in words]
+        features += [f"w:{part}" for word in words if '_' in word for part in word.split('_') if part]
+
+        padded = f" {' '.join(words)} "
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            features += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+        return features
+
+    def _embed_one(self, text: str) -> list:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+
+        for feature, count in Counter(self._features(text)).items():
+            feature_hash = zlib.crc32(feature.encode('utf-8'))
+            sign = -1.0 if feature_hash & 0x80000000 else 1.0
+            vector[feature_hash % self.dimension] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+
+        return (vector / norm).tolist()
+
+    def _embed_sync(self, texts: list) -> list:
+        return [self._embed_one(text) for text in texts]
+
+    async def embed(self, texts: list) -> list:
+        with timed_span("embedding.request", EMBEDDING_REQUEST_DURATION, {'kind': 'batch' if len(texts) > 1 else 'single', 'backend': 'hashing'}):
+            # Consultas isoladas levam bem menos de 1 ms; lotes grandes saem do event loop
+            if len(texts) <= 8:
+                return self._embed_sync(texts)
+            return await asyncio.to_thread(self._embed_sync, texts)
+
+    async def close(self):
+        pass
+
+class OnnxEmbedder:
+    """Modelo de embedding local em ONNX (ex.: CodeBERT exportado), com tokenizer do pacote `tokenizers`.
+
+    onnxruntime e tokenizers são opcionais e só são importados no primeiro embed.
+    A saída por token passa por mean pooling com a attention mask.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str, dimension: int, name: str = None,
+                 max_length: int = 256, batch_size: int = 16, max_concurrency: int = 1):
+        self.name = name or os.path.splitext(os.path.basename(model_path))[0]
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path
+        self.dimension = dimension
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._session = None
+        self._tokenizer = None
+        self._semaphore = None
+
+    def _load(self):
+        if self._session is not None:
+            return
+
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx requer os pacotes onnxruntime e tokenizers")
+
+        tokenizer = Tokenizer.from_file(self.tokenizer_path)
+        tokenizer.enable_truncation(max_length=self.max_length)
+        tokenizer.enable_padding()
+
+        self._tokenizer = tokenizer
+        self._session = onnxruntime.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+
+    def _embed_sync(self, texts: list) -> list:
+        self._load()
+
+        encodings = self._tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        inputs = {node.name: features[node.name] for node in self._session.get_inputs() if node.name in features}
+
+        token_embeddings = self._session.run(None, inputs)[0]
+        mask = features["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        return [vector.astype(np.float32).tolist() for vector in pooled]
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    async def embed(self, texts: list) -> list:
+        async with self._get_semaphore():
+            with timed_span("embedding.request", EMBEDDING_REQUEST_DURATION, {'kind': 'batch' if len(texts) > 1 else 'single', 'backend': 'onnx'}):
+                return await asyncio.to_thread(self._embed_sync, texts)
+
+    async def close(self):
+        self._session = None
+        self._tokenizer = None
 
 class EmbeddingManager:
     def __init__(self):
+        self.backend = os.environ.get("EMBEDDING_BACKEND", "huggingface").lower()
+        self.model_name = os.environ.get("EMBEDDING_MODEL_NAME")
         self.hf_token = os.environ.get("HUGGINGFACE_TOKEN")
-        self.base_url = "https://api-inference.huggingface.co/models/microsoft/codebert-base"
-        
+        self.base_url = os.environ.get("EMBEDDING_URL", "https://api-inference.huggingface.co/models/microsoft/codebert-base")
+        self.onnx_model_path = os.environ.get("EMBEDDING_ONNX_MODEL")
+        self.onnx_tokenizer_path = os.environ.get("EMBEDDING_ONNX_TOKENIZER")
+        self.dimension = int(os.environ.get("EMBEDDING_DIMENSION", "768"))
+        self.timeout = float(os.environ.get("EMBEDDING_TIMEOUT", "30"))
+        self.max_concurrency = int(os.environ.get("EMBEDDING_MAX_CONCURRENCY", "4"))
+        self.max_backoff = float(os.environ.get("EMBEDDING_MAX_BACKOFF", "20"))
+        self.batch_size = int(os.environ.get("EMBEDDING_BATCH_SIZE", "8"))
+        self.rate_limit = float(os.environ.get("EMBEDDING_RATE_LIMIT", "5"))
+
     def get_embedding_model(self):
-        embed_model = {
-            "name": "codebert-base",
-            "url": self.base_url,
-            "token": self.hf_token
-        }
-        
-        return embed_model
+        if self.backend == "hashing":
+            return HashingEmbedder(self.dimension, name=self.model_name)
+
+        if self.backend == "onnx":
+            if not self.onnx_model_path or not self.onnx_tokenizer_path:
+                raise ValueError("EMBEDDING_BACKEND=onnx requer EMBEDDING_ONNX_MODEL e EMBEDDING_ONNX_TOKENIZER")
+
+            return OnnxEmbedder(
+                self.onnx_model_path,
+                self.onnx_tokenizer_path,
+                self.dimension,
+                name=self.model_name,
+                batch_size=self.batch_size
+            )
+
+        if self.backend != "huggingface":
+            raise ValueError(f"EMBEDDING_BACKEND desconhecido: {self.backend}")
+
+        return HuggingFaceEmbedder(
+            self.base_url,
+            self.hf_token,
+            self.dimension,
+            name=self.model_name or "codebert-base",
+            timeout=self.timeout,
+            max_concurrency=self.max_concurrency,
+            max_backoff=self.max_backoff,
+            batch_size=self.batch_size,
+            rate_limit=self.rate_limit
+        )
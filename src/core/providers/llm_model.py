@@ -1,11 +1,33 @@
-from groq import Groq
+from groq import AsyncGroq
 import os
 
 class LlmModel:
     def __init__(self):
-        self.model = Groq(
-            api_key=os.environ.get("GROQ_API_KEY"),
-        )
+        self.model_name = os.environ.get("LLM_MODEL", "deepseek-r1-distill-llama-70b")
+        self.timeout = float(os.environ.get("LLM_TIMEOUT", "120"))
+        self.max_concurrency = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+        self.model = None
     
     def get_llm_model(self):
-        return self.model
\ No newline at end of file
+        if self.model is None:
+            self.model = AsyncGroq(
+                api_key=os.environ.get("GROQ_API_KEY"),
+                timeout=self.timeout,
+                max_retries=2,
+            )
+
+        return self.model
+
+    def get_llm_config(self):
+        llm_config = {
+            "model": self.model_name,
+            "timeout": self.timeout,
+            "max_concurrency": self.max_concurrency
+        }
+
+        return llm_config
+
+    async def close(self):
+        if self.model is not None:
+            await self.model.close()
+            self.model = None
@@ -0,0 +1,44 @@
+import asyncio
+
+class SingleFlight:
+    """Chamadas concorrentes com a mesma chave compartilham uma única execução em voo.
+
+    Quem chega enquanto a chave está em voo aguarda o mesmo resultado (ou a mesma exceção);
+    terminada a execução, a chave sai do mapa e a próxima chamada executa de novo. Cancelar
+    um dos chamadores não cancela a execução compartilhada. O resultado é o mesmo objeto para
+    todos os chamadores: trate-o como somente leitura.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.executions = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
+
+    def forget(self, key):
+        """Próximas chamadas com a chave executam de novo, mesmo com uma execução ainda em voo
+        (ex.: o arquivo foi modificado depois que a leitura em voo começou)
+        """
+        self._inflight.pop(key, None)
+
+    def _done(self, key, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        # Se todos os chamadores desistiram, a exceção não fica como "never retrieved"
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from opentelemetry import metrics, trace
+from opentelemetry.exporter.prometheus import PrometheusMetricReader
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics import Histogram, MeterProvider
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import asyncio
+import time
+
+# Buckets em segundos para todos os histogramas de latência (os padrões do OpenTelemetry são em ms)
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+# O PrometheusMetricReader publica as métricas no registry padrão do prometheus_client,
+# que é o que o endpoint /metrics serializa
+metrics.set_meter_provider(MeterProvider(
+    metric_readers=[PrometheusMetricReader()],
+    views=[
+        View(
+            instrument_type=Histogram,
+            instrument_name="cimut_*",
+            aggregation=ExplicitBucketHistogramAggregation(LATENCY_BUCKETS)
+        )
+    ]
+))
+
+tracer = trace.get_tracer("cimut")
+meter = metrics.get_meter("cimut")
+
+PIPELINE_STAGE_DURATION = meter.create_histogram(
+    "cimut_pipeline_stage_duration",
+    unit="s",
+    description="Duração de cada etapa do pipeline find-fault-target"
+)
+EMBEDDING_REQUEST_DURATION = meter.create_histogram(
+    "cimut_embedding_request_duration",
+    unit="s",
+    description="Latência das requisições de embedding"
+)
+LLM_REQUEST_DURATION = meter.create_histogram(
+    "cimut_llm_request_duration",
+    unit="s",
+    description="Latência das chamadas ao LLM"
+)
+LLM_TOKENS = meter.create_counter(
+    "cimut_llm_tokens",
+    description="Tokens consumidos nas chamadas ao LLM, por tipo (prompt/completion)"
+)
+AGENT_COMMAND_DURATION = meter.create_histogram(
+    "cimut_agent_command_duration",
+    unit="s",
+    description="Tempo de ida e volta dos comandos WebSocket, por agente e ação"
+)
+EVENT_LOOP_LAG = meter.create_histogram(
+    "cimut_event_loop_lag",
+    unit="s",
+    description="Atraso do event loop em relação ao intervalo de amostragem"
+)
+
+async def monitor_event_loop(interval: float = 0.1):
+    """Mede quanto o event loop atrasa para acordar uma tarefa agendada (código bloqueante no loop)"""
+    while True:
+        started_at = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.record(max(time.perf_counter() - started_at - interval, 0.0))
+
+def register_gauge(name: str, description: str, callback):
+    """callback() -> lista de (valor, atributos), lida a cada coleta"""
+    def observe(options: CallbackOptions):
+        return [Observation(value, attributes) for value, attributes in callback()]
+
+    meter.create_observable_gauge(name, callbacks=[observe], description=description)
+
+def register_counter(name: str, description: str, callback):
+    """Como register_gauge, para valores cumulativos (ex.: hits/misses de cache)"""
+    def observe(options: CallbackOptions):
+        return [Observation(value, attributes) for value, attributes in callback()]
+
+    meter.create_observable_counter(name, callbacks=[observe], description=description)
+
+@contextmanager
+def timed_span(name: str, histogram, attributes: dict = None):
+    """Abre um span e registra sua duração no histograma; o atributo 'outcome' vira 'error' em exceções"""
+    attributes = dict(attributes or {})
+    started_at = time.perf_counter()
+
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        outcome = 'success'
+        try:
+            yield span
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            histogram.record(time.perf_counter() - started_at, {**attributes, 'outcome': outcome})
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,16 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from src.app.api.controllers import AgentRouter
-from src.app.data import VectorRepository
+from src.app.api.controllers import AgentRouter, CampaignRouter, HealthRouter, JobRouter, MetricsRouter
+from src.app.services import agent_service_instance, campaign_service_instance, job_service_instance, repository_instance
+from src.core.telemetry import monitor_event_loop
 from logging import getLogger
-
-repository = VectorRepository()
+import asyncio
 
 logger = getLogger(__name__)
 
 def init_routers(app_: FastAPI) -> None:
   app_.include_router(AgentRouter, prefix="/api")
+  app_.include_router(JobRouter, prefix="/api")
+  app_.include_router(CampaignRouter, prefix="/api")
+  app_.include_router(MetricsRouter)
+  app_.include_router(HealthRouter)
 
 def create_app() -> FastAPI:
   app_ = FastAPI(
@@ -29,15 +33,21 @@ def create_app() -> FastAPI:
       allow_headers=["*"],
   )
   
-  # Startup event para inicializar embeddings
+  # A porta abre sem esperar os embeddings: o aquecimento roda em segundo plano (progresso em /health/ready)
   @app_.on_event("startup")
   async def startup_event():
-      logger.info("Inicializando embeddings da base de conhecimento...")
-      try:
-          repository.initialize_embeddings()
-          logger.info("Embeddings inicializados com sucesso!")
-      except Exception as e:
-          logger.error(f"Erro ao inicializar embeddings: {e}")
+      app_.state.loop_monitor = asyncio.create_task(monitor_event_loop())
+      await agent_service_instance.start()
+      await job_service_instance.start()
+      logger.info("Inicializando embeddings da base de conhecimento em segundo plano...")
+      repository_instance.start_warmup()
+
+  @app_.on_event("shutdown")
+  async def shutdown_event():
+      app_.state.loop_monitor.cancel()
+      await campaign_service_instance.close()
+      await job_service_instance.close()
+      await agent_service_instance.close()
   
   init_routers(app_=app_)
   return app_